@@ -1,8 +1,12 @@
 #!/usr/bin/python
 
 import struct
+import sys
 import time
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 # Initialize our list of phrases
 phrases = (
@@ -13,64 +17,249 @@ phrases = (
     '0', '1', '2', '3', '4', '5', '6', '7', '8', '9', ':', ';', '?'
 )
 
-prefices = list(enumerate(phrases))
+# Object array of the phrases so a whole token array can be looked up at once
+phrase_table = np.array(phrases, dtype=object)
 
+# Length of the longest phrase, i.e. how far ahead a single match can look
+MAX_PHRASE = max(map(len, phrases))
 
-# Function to find the longest phrase that is a prefix of the string
-def find_encoding(en, string):
-    for k, w in en:
-        if string.startswith(w):
-            return w, k
+
+# Build a trie over the phrase table. Each node maps a character to its child
+# node; the key None marks a node where a phrase ends and holds its index.
+def build_trie(phrases):
+    root = {}
+    for index, phrase in enumerate(phrases):
+        node = root
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[None] = index
+    return root
+
+
+trie = build_trie(phrases)
+
+
+# Function to find the longest phrase that starts at position pos of the string.
+# Walks the trie from the cursor instead of slicing the string, so each call
+# only touches the characters of the match. Returns (length, index).
+def find_encoding(trie, string, pos):
+    node = trie
+    match = None
+    i = pos
+    end = len(string)
+    while i < end:
+        node = node.get(string[i])
+        if node is None:
+            break
+        i += 1
+        if None in node:
+            match = (i - pos, node[None])
+    if match is None:
+        raise ValueError(f"No phrase matches the input at offset {pos}: {string[pos]!r}")
+    return match
+
+
+# Split the text into phrase indices, one byte per token, starting new tokens
+# only before position limit. Returns the tokens and the position reached.
+def tokenize_from(data, limit):
+    tokens = bytearray()
+    pos = 0
+    while pos < limit:
+        n, t = find_encoding(trie, data, pos)
+        pos += n
+        tokens.append(t)
+    return tokens, pos
+
+
+# Split the whole text into phrase indices
+def tokenize(data):
+    return tokenize_from(data, len(data))[0]
+
+
+# Pack phrase indices four to a 24-bit little-endian group. A trailing partial
+# group of k sextuples is cut down to the (6k + 7) // 8 bytes it occupies.
+def pack_sextuples(tokens):
+    tokens = np.frombuffer(tokens, dtype=np.uint8)
+    full, rest = divmod(len(tokens), 4)
+    groups = np.zeros((full + (rest > 0), 4), dtype=np.uint32)
+    groups.flat[:len(tokens)] = tokens
+    packed = groups[:, 0] | (groups[:, 1] << 6) | (groups[:, 2] << 12) | (groups[:, 3] << 18)
+    outbytes = packed.astype('<u4').view(np.uint8).reshape(-1, 4)[:, :3]
+    return outbytes.tobytes()[:full * 3 + (rest * 6 + 7) // 8]
+
+
+# Unpack 24-bit groups back into phrase indices. If the token count is known
+# the padding is simply cut off; otherwise, as before, a zero index in the last
+# group is taken to be padding and ends the stream.
+def unpack_sextuples(indata, count=None):
+    size = len(indata)
+    groups = np.zeros(((size + 2) // 3, 4), dtype=np.uint8)
+    groups[:, :3].flat[:size] = np.frombuffer(indata, dtype=np.uint8)
+    packed = groups.view('<u4').ravel()
+    tokens = ((packed[:, None] >> np.array([0, 6, 12, 18], dtype=np.uint32)) & 63).astype(np.uint8).ravel()
+    if count is not None:
+        if count > len(tokens):
+            raise ValueError(f"Block holds {len(tokens)} tokens, header says {count}")
+        return tokens[:count]
+    if len(tokens) > 0:
+        last = tokens[-4:]
+        zeros = np.flatnonzero(last == 0)
+        if len(zeros) > 0:
+            tokens = tokens[:len(tokens) - 4 + zeros[0]]
+    return tokens
 
 
 # Compression function
 def compress(input_file, compressed_file):
     with open(input_file, 'r') as fin, open(compressed_file, 'wb') as fout:
         data = fin.read()
-        sextuple = 0
-        encoding = 0
-        outbytes = bytearray(4)
-
-        while len(data) > 0:
-            s, t = find_encoding(prefices, data)
-            data = data[len(s):]
-            encoding += t << (6 * sextuple)
-
-            if sextuple < 3:
-                sextuple += 1
-            else:
-                outbytes = struct.pack("<I", encoding)
-                fout.write(outbytes[0:3])
-                sextuple = 0
-                encoding = 0
-
-        # Handle any remaining bits (if data wasn't divisible by 4)
-        if sextuple > 0:
-            outbytes = struct.pack("<I", encoding)
-            fout.write(outbytes[0:(sextuple * 6 + 7) // 8])  # Write the correct number of bytes
+        fout.write(pack_sextuples(tokenize(data)))
 
 
 # Decompression function
 def decompress(compressed_file, output_file):
     with open(compressed_file, 'rb') as fin, open(output_file, 'w') as fout:
         indata = fin.read()
+        tokens = unpack_sextuples(indata)
+        fout.write(''.join(phrase_table[tokens]))
+
+
+# Block container: a magic number followed by blocks, each with a header of
+# (raw length in characters, token count) and the packed sextuples
+BLOCK_MAGIC = b'PH6B'
+BLOCK_HEADER = struct.Struct('<II')
+BLOCK_SIZE = 1 << 20  # Target block size in characters
+
+# Characters that never appear past the first position of a phrase. A token
+# can never span one of them, so cutting the text just before one gives the
+# same tokens as encoding the whole text.
+separators = re.compile('[' + re.escape(''.join(
+    sorted({ch for w in phrases for ch in w} - {ch for w in phrases for ch in w[1:]}))) + ']')
+
+
+# Split the text into blocks of roughly block_size characters on token boundaries
+def split_blocks(data, block_size=BLOCK_SIZE):
+    blocks = []
+    start = 0
+    end = len(data)
+    while start < end:
+        cut = separators.search(data, min(start + block_size, end))
+        stop = cut.start() if cut else end
+        blocks.append(data[start:stop])
+        start = stop
+    return blocks
+
 
-        while len(indata) > 0:
-            to_read = min(3, len(indata))  # Read up to 3 bytes, depending on available data
-            buffer = indata[:to_read] + b'\0' * (3 - to_read)  # Pad with zeros if needed
+# Encode one block into its header and payload
+def encode_block(text):
+    tokens = tokenize(text)
+    return BLOCK_HEADER.pack(len(text), len(tokens)) + pack_sextuples(tokens)
 
-            # Unpack only if there is sufficient data (always at least 1 byte)
-            if len(buffer) > 0:
-                fourphrases = struct.unpack("<I", buffer + b'\0')[0]  # Pad to 4 bytes for unpacking
 
-            indata = indata[to_read:]  # Move the pointer
+# Decode the payload of one block back into text
+def decode_block(payload, raw_length, count):
+    text = ''.join(phrase_table[unpack_sextuples(payload, count)])
+    if len(text) != raw_length:
+        raise ValueError(f"Block decoded to {len(text)} characters, header says {raw_length}")
+    return text
+
+
+# Block-parallel compression: blocks are encoded independently in a process pool
+def compress_blocks(input_file, compressed_file, block_size=BLOCK_SIZE, workers=None):
+    with open(input_file, 'r') as fin:
+        data = fin.read()
+    blocks = split_blocks(data, block_size)
+
+    with open(compressed_file, 'wb') as fout, ProcessPoolExecutor(workers) as pool:
+        fout.write(BLOCK_MAGIC)
+        for encoded in pool.map(encode_block, blocks):
+            fout.write(encoded)
+
+
+# Block-parallel decompression: the headers are walked first, then the blocks
+# are decoded independently in a process pool
+def decompress_blocks(compressed_file, output_file, workers=None):
+    with open(compressed_file, 'rb') as fin:
+        indata = fin.read()
+    if indata[:len(BLOCK_MAGIC)] != BLOCK_MAGIC:
+        raise ValueError("Not a block-mode phrase file")
 
-            # Process each 6-bit chunk in fourphrases
-            for i in range(0, 4):
-                ind = (fourphrases >> 6 * i) & 63
-                if len(indata) == 0 and ind == 0:
-                    break  # Stop if padding from the last chunk
-                fout.write(phrases[ind])
+    payloads, raw_lengths, counts = [], [], []
+    pos = len(BLOCK_MAGIC)
+    while pos < len(indata):
+        raw_length, count = BLOCK_HEADER.unpack_from(indata, pos)
+        pos += BLOCK_HEADER.size
+        size = count // 4 * 3 + (count % 4 * 6 + 7) // 8
+        if pos + size > len(indata):
+            raise ValueError("Truncated block")
+        payloads.append(indata[pos:pos + size])
+        raw_lengths.append(raw_length)
+        counts.append(count)
+        pos += size
+
+    with open(output_file, 'w') as fout, ProcessPoolExecutor(workers) as pool:
+        for text in pool.map(decode_block, payloads, raw_lengths, counts):
+            fout.write(text)
+
+
+# Streaming mode works on chunks of this many characters (or bytes)
+CHUNK_SIZE = 1 << 16
+
+
+# Read a file object in fixed-size chunks
+def read_chunks(f, size=CHUNK_SIZE):
+    while chunk := f.read(size):
+        yield chunk
+
+
+# Streaming encoder: takes an iterable of text chunks and yields compressed
+# bytes in the same format as compress(). Only the text a phrase could still
+# extend into the next chunk and fewer than four tokens are carried over.
+def compress_stream(chunks):
+    text = ''
+    tokens = bytearray()
+    for chunk in chunks:
+        text += chunk
+        # A match is only final once a full phrase length of lookahead is available
+        new_tokens, pos = tokenize_from(text, len(text) - MAX_PHRASE + 1)
+        text = text[pos:]
+        tokens += new_tokens
+        whole = len(tokens) // 4 * 4
+        if whole > 0:
+            yield pack_sextuples(tokens[:whole])
+            del tokens[:whole]
+    tokens += tokenize(text)
+    if tokens:
+        yield pack_sextuples(tokens)
+
+
+# Streaming decoder: takes an iterable of compressed byte chunks and yields
+# text. Bytes are decoded in whole 3-byte groups; the last group is always held
+# back because only the final group of the stream can carry padding.
+def decompress_stream(chunks):
+    pending = b''
+    for chunk in chunks:
+        data = pending + chunk
+        whole = max(len(data) - 1, 0) // 3 * 3
+        if whole > 0:
+            yield ''.join(phrase_table[unpack_sextuples(data[:whole], whole // 3 * 4)])
+        pending = data[whole:]
+    if pending:
+        yield ''.join(phrase_table[unpack_sextuples(pending)])
+
+
+# Constant-memory compression between files
+def compress_streaming(input_file, compressed_file, chunk_size=CHUNK_SIZE):
+    with open(input_file, 'r') as fin, open(compressed_file, 'wb') as fout:
+        for outbytes in compress_stream(read_chunks(fin, chunk_size)):
+            fout.write(outbytes)
+
+
+# Constant-memory decompression between files
+def decompress_streaming(compressed_file, output_file, chunk_size=CHUNK_SIZE):
+    with open(compressed_file, 'rb') as fin, open(output_file, 'w') as fout:
+        for text in decompress_stream(read_chunks(fin, chunk_size)):
+            fout.write(text)
 
 
 # Calculate file sizes and compression ratio
@@ -88,6 +277,19 @@ def files_are_equal(file1, file2):
 
 # Main function
 if __name__ == "__main__":
+    # Filter mode: "run.py -c" compresses and "run.py -d" decompresses stdin
+    # to stdout in constant memory
+    if len(sys.argv) > 1:
+        if sys.argv[1] == '-c':
+            for outbytes in compress_stream(read_chunks(sys.stdin)):
+                sys.stdout.buffer.write(outbytes)
+        elif sys.argv[1] == '-d':
+            for text in decompress_stream(read_chunks(sys.stdin.buffer)):
+                sys.stdout.write(text)
+        else:
+            sys.exit(f"usage: {sys.argv[0]} [-c | -d] < input > output")
+        sys.exit(0)
+
     input_file = '../test.txt'
     compressed_file = 'compressed'
     output_file = 'out.txt'
@@ -113,3 +315,24 @@ if __name__ == "__main__":
         print("Success: The decompressed file matches the original input file.")
     else:
         print("Error: The decompressed file does not match the original input file.")
+
+    # Block-parallel mode
+    compressed_file = 'compressed.blocks'
+
+    start_time = time.time()
+    compress_blocks(input_file, compressed_file)
+    compress_time = time.time() - start_time
+    print(f"Block compression time: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    decompress_blocks(compressed_file, output_file)
+    decompress_time = time.time() - start_time
+    print(f"Block decompression time: {decompress_time:.4f} seconds")
+
+    ratio = compression_ratio(input_file, compressed_file)
+    print(f"Block compression ratio: {ratio:.4f}")
+
+    if files_are_equal(input_file, output_file):
+        print("Success: The block-mode output matches the original input file.")
+    else:
+        print("Error: The block-mode output does not match the original input file.")
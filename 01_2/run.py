@@ -13,28 +13,56 @@ phrases = (
     '0', '1', '2', '3', '4', '5', '6', '7', '8', '9', ':', ';', '?'
 )
 
-prefices = list(enumerate(phrases))
 
-
-# Function to find the longest phrase that is a prefix of the string
-def find_encoding(en, string):
-    for k, w in en:
-        if string.startswith(w):
-            return w, k
+# Build a trie over the phrase table. Each node maps a character to its child
+# node; the key None marks a node where a phrase ends and holds its index.
+def build_trie(phrases):
+    root = {}
+    for index, phrase in enumerate(phrases):
+        node = root
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[None] = index
+    return root
+
+
+trie = build_trie(phrases)
+
+
+# Function to find the longest phrase that starts at position pos of the string.
+# Walks the trie from the cursor instead of slicing the string, so each call
+# only touches the characters of the match. Returns (length, index).
+def find_encoding(trie, string, pos):
+    node = trie
+    match = None
+    i = pos
+    end = len(string)
+    while i < end:
+        node = node.get(string[i])
+        if node is None:
+            break
+        i += 1
+        if None in node:
+            match = (i - pos, node[None])
+    if match is None:
+        raise ValueError(f"No phrase matches the input at offset {pos}: {string[pos]!r}")
+    return match
 
 
 # Compression function
 def compress(input_file, compressed_file):
     with open(input_file, 'r') as fin, open(compressed_file, 'wb') as fout:
         data = fin.read()
+        pos = 0
+        end = len(data)
         sextuple = 0
         encoding = 0
         outbytes = bytearray(4)
 
-        while len(data) > 0:
+        while pos < end:
             if sextuple < 4:
-                s, t = find_encoding(prefices, data)
-                data = data[len(s):]
+                n, t = find_encoding(trie, data, pos)
+                pos += n
                 encoding += t << (6 * sextuple)
                 sextuple += 1
             else:
@@ -1,77 +1,245 @@
 import time
 import os
+import struct
+import numpy as np
 
-# Initialize the maximum dictionary size for LZW (commonly set as 4096 for 12-bit codes)
-MAX_DICT_SIZE = 4096
+# Default limit on the code width; the dictionary holds up to 2 ** MAX_BITS
+# entries (classic compress used 12 bits, i.e. 4096 entries)
+MAX_BITS = 16
 
-# Compression function using Lempel-Ziv-Welch (LZW) algorithm
-def compress(input_file, compressed_file):
-    # Initialize dictionary with single character strings
-    dictionary = {chr(i): i for i in range(256)}
-    dict_size = 256
-    string = ""
+# Range of supported code width limits
+MIN_CODE_WIDTH = 9
+LIMIT_BITS = 20
+
+# Code 256 tells the decoder to clear its dictionary; new entries start at 257
+CLEAR_CODE = 256
+FIRST_CODE = 257
+
+# Once the dictionary is full, the encoder checks the compression ratio since
+# the last reset every CHECK_GAP input bytes and clears the dictionary as soon
+# as the ratio stops improving
+CHECK_GAP = 10000
+
+# Size of the decoder's output buffer
+OUTPUT_CHUNK_SIZE = 1 << 20
+
+# Width of the k-th code after a reset. The encoder's dictionary holds 257 + k
+# entries when it writes that code (the decoder's one fewer, plus the code it is
+# about to add), so the code can be at most 256 + k. Codes start out 9 bits wide
+# and grow as the dictionary fills, as in classic compress.
+def code_width(k, max_bits):
+    return max(MIN_CODE_WIDTH, min(256 + k, (1 << max_bits) - 1).bit_length())
+
+# Index of the first code after k that is wider than code k, or None once the
+# codes have reached their maximum width
+def width_run_end(k, max_bits):
+    width = code_width(k, max_bits)
+    if width >= max_bits:
+        return None
+    return (1 << width) - 256
+
+# Total number of bits taken by the first n codes after a reset
+def stream_bits(n, max_bits):
+    bits = 0
+    k = 0
+    while k < n:
+        run_end = width_run_end(k, max_bits)
+        count = n - k if run_end is None else min(n, run_end) - k
+        bits += count * code_width(k, max_bits)
+        k += count
+    return bits
+
+# Pack codes MSB-first at their growing widths into a single buffer. The width
+# drops back to 9 bits after every CLEAR code.
+def pack_codes(codes, max_bits):
+    packed = bytearray()
+    acc = 0
+    nbits = 0
+    k = 0
+    for code in codes:
+        width = code_width(k, max_bits)
+        acc = (acc << width) | code
+        nbits += width
+        while nbits >= 8:
+            nbits -= 8
+            packed.append((acc >> nbits) & 0xFF)
+        acc &= (1 << nbits) - 1
+        k = 0 if code == CLEAR_CODE else k + 1
+    if nbits:
+        packed.append((acc << (8 - nbits)) & 0xFF)
+    return packed
+
+# Read all codes back from a packed buffer at once. Between CLEAR codes the
+# width only depends on the code index, so the stream splits into runs of
+# equal-width codes, and each run is cut out of the buffer with NumPy shifts
+# and masks; a run is cut short at a CLEAR code, after which the widths start
+# over. Fewer bits than one code width left at the end are padding.
+def unpack_codes(packed, max_bits):
+    data = np.frombuffer(bytes(packed) + bytes(4), dtype=np.uint8).astype(np.int64)
+    total_bits = len(packed) * 8
+    runs = []
+    k = 0
+    bit = 0
+    while True:
+        width = code_width(k, max_bits)
+        count = (total_bits - bit) // width
+        run_end = width_run_end(k, max_bits)
+        if run_end is not None:
+            count = min(count, run_end - k)
+        if count <= 0:
+            break
+        positions = bit + width * np.arange(count, dtype=np.int64)
+        index = positions >> 3
+        words = (data[index] << 24) | (data[index + 1] << 16) | (data[index + 2] << 8) | data[index + 3]
+        run = (words >> (32 - width - (positions & 7))) & ((1 << width) - 1)
+
+        clears = np.flatnonzero(run == CLEAR_CODE)
+        if len(clears) > 0:
+            count = int(clears[0]) + 1
+            run = run[:count]
+            k = 0
+        else:
+            k += count
+        runs.append(run)
+        bit += width * count
+    return np.concatenate(runs) if runs else np.zeros(0, dtype=np.int64)
+
+# LZW-encode a bytes-like object (bytes, bytearray or memoryview) into a list
+# of codes. Bytes are handled as the integers 0-255 throughout, so any binary
+# input works.
+def lzw_encode(data, max_bits=MAX_BITS):
+    if not MIN_CODE_WIDTH <= max_bits <= LIMIT_BITS:
+        raise ValueError(f"max_bits must be between {MIN_CODE_WIDTH} and {LIMIT_BITS}")
+    max_dict_size = 1 << max_bits
+    data = memoryview(data).cast('B')
+
+    # The dictionary maps (prefix code, next byte) to a code, packed into one
+    # integer key; the 256 single-byte strings are implicit codes 0-255
+    dictionary = {}
+    dict_size = FIRST_CODE
     compressed_data = []
 
-    with open(input_file, 'r') as fin:
-        data = fin.read()
-        for symbol in data:
-            string_plus_symbol = string + symbol
-            if string_plus_symbol in dictionary:
-                string = string_plus_symbol
-            else:
-                compressed_data.append(dictionary[string])
-                if dict_size < MAX_DICT_SIZE:
-                    dictionary[string_plus_symbol] = dict_size
-                    dict_size += 1
-                string = symbol
+    if data:
+        # Input position and output code index where the current dictionary started
+        reset_pos = 0
+        reset_index = 0
+        best_ratio = 0
+
+        code = data[0]
+        pos = 1
+        while pos < len(data):
+            end = min(pos + CHECK_GAP, len(data))
+            for symbol in data[pos:end]:
+                key = (code << 8) | symbol
+                next_code = dictionary.get(key)
+                if next_code is not None:
+                    code = next_code
+                else:
+                    compressed_data.append(code)
+                    if dict_size < max_dict_size:
+                        dictionary[key] = dict_size
+                        dict_size += 1
+                    code = symbol
+            pos = end
+
+            # With a full dictionary, reset once the ratio since the last reset drops
+            if dict_size >= max_dict_size and pos < len(data):
+                ratio = (pos - reset_pos) / stream_bits(len(compressed_data) - reset_index, max_bits)
+                if ratio > best_ratio:
+                    best_ratio = ratio
+                else:
+                    compressed_data.append(code)
+                    compressed_data.append(CLEAR_CODE)
+                    dictionary.clear()
+                    dict_size = FIRST_CODE
+                    best_ratio = 0
+                    reset_pos = pos
+                    reset_index = len(compressed_data)
+                    code = data[pos]
+                    pos += 1
 
         # Output the code for the last string
-        if string:
-            compressed_data.append(dictionary[string])
+        compressed_data.append(code)
+    return compressed_data
 
-    # Write the compressed data to file
-    with open(compressed_file, 'wb') as fout:
-        for data in compressed_data:
-            fout.write(data.to_bytes(2, byteorder='big'))
+# Decode a list of LZW codes, writing the bytes to a binary file object
+def lzw_decode(compressed_data, max_bits, fout):
+    max_dict_size = 1 << max_bits
 
-# Decompression function using LZW algorithm
-def decompress(compressed_file, output_file):
-    # Initialize the dictionary with single character strings
-    dictionary = {i: chr(i) for i in range(256)}
-    dict_size = 256
-    decompressed_data = []
+    # Every code past 256 is stored as a pointer to its prefix code plus its
+    # last byte, along with its length and first byte
+    prefix = [0] * max_dict_size
+    suffix = bytearray(range(256)) + bytearray(max_dict_size - 256)
+    first = bytearray(range(256)) + bytearray(max_dict_size - 256)
+    length = [1] * max_dict_size
+    dict_size = FIRST_CODE
 
-    with open(compressed_file, 'rb') as fin:
-        compressed_data = []
-        byte = fin.read(2)
-        while byte:
-            compressed_data.append(int.from_bytes(byte, byteorder='big'))
-            byte = fin.read(2)
-
-    # Read the first value and initialize
-    string = chr(compressed_data.pop(0))
-    decompressed_data.append(string)
-
-    for code in compressed_data:
-        if code in dictionary:
-            entry = dictionary[code]
-        elif code == dict_size:
-            entry = string + string[0]
-        else:
-            raise ValueError("Invalid compressed code")
+    # Output goes through a fixed buffer that is written out whenever full
+    decompressed_data = bytearray(OUTPUT_CHUNK_SIZE)
+    pos = 0
 
-        decompressed_data.append(entry)
+    previous = None
+    for index in range(len(compressed_data)):
+        code = compressed_data[index]
+        if code == CLEAR_CODE:
+            dict_size = FIRST_CODE
+            previous = None
+            continue
+        if code > dict_size or (code == dict_size and (previous is None or dict_size >= max_dict_size)):
+            raise ValueError("Invalid compressed code")
 
-        # Add new string to the dictionary
-        if dict_size < MAX_DICT_SIZE:
-            dictionary[dict_size] = string + entry[0]
+        # Add the previous string plus the first byte of this one. Doing it
+        # before decoding also covers the case where code is this very entry.
+        if previous is not None and dict_size < max_dict_size:
+            prefix[dict_size] = previous
+            suffix[dict_size] = first[code] if code < dict_size else first[previous]
+            first[dict_size] = first[previous]
+            length[dict_size] = length[previous] + 1
             dict_size += 1
 
-        string = entry
+        n = length[code]
+        if pos + n > len(decompressed_data):
+            fout.write(decompressed_data[:pos])
+            pos = 0
+            if n > len(decompressed_data):
+                decompressed_data = bytearray(n)
+
+        # Follow the prefix pointers, writing the string back to front
+        i = pos + n - 1
+        c = code
+        while c >= 256:
+            decompressed_data[i] = suffix[c]
+            c = prefix[c]
+            i -= 1
+        decompressed_data[i] = c
+        pos += n
+        previous = code
+
+    # Write the rest of the decompressed data
+    fout.write(decompressed_data[:pos])
+
+# Compression function using Lempel-Ziv-Welch (LZW) algorithm
+def compress(input_file, compressed_file, max_bits=MAX_BITS):
+    with open(input_file, 'rb') as fin:
+        data = fin.read()
+    compressed_data = lzw_encode(data, max_bits)
+
+    # Write the code width limit and the bit-packed codes to file
+    with open(compressed_file, 'wb') as fout:
+        fout.write(struct.pack('B', max_bits))
+        fout.write(pack_codes(compressed_data, max_bits))
+
+# Decompression function using LZW algorithm
+def decompress(compressed_file, output_file):
+    # Load the code width limit and unpack all codes in one go
+    with open(compressed_file, 'rb') as fin:
+        max_bits = struct.unpack('B', fin.read(1))[0]
+        if not MIN_CODE_WIDTH <= max_bits <= LIMIT_BITS:
+            raise ValueError(f"Unsupported code width limit {max_bits}")
+        compressed_data = unpack_codes(fin.read(), max_bits).tolist()
 
-    # Write the decompressed data to file
-    with open(output_file, 'w') as fout:
-        fout.write(''.join(decompressed_data))
+    with open(output_file, 'wb') as fout:
+        lzw_decode(compressed_data, max_bits, fout)
 
 
 # Calculate file sizes and compression ratio
@@ -83,7 +251,7 @@ def compression_ratio(input_file, compressed_file):
 
 # Verify if two files are identical
 def files_are_equal(file1, file2):
-    with open(file1, 'r') as f1, open(file2, 'r') as f2:
+    with open(file1, 'rb') as f1, open(file2, 'rb') as f2:
         return f1.read() == f2.read()
 
 
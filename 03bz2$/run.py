@@ -1,24 +1,30 @@
 import time
 import os
-import bz2
+import sys
+
+# Make the lossless package at the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lossless import get_codec
+
+codec = get_codec('bz2')
+parallel_codec = get_codec('bz2', workers=None)
 
 # Bzip2 Compression function
 def compress(input_file, compressed_file):
-    with open(input_file, 'rb') as fin:
-        data = fin.read()
-        compressed_data = bz2.compress(data)
-
-    with open(compressed_file, 'wb') as fout:
-        fout.write(compressed_data)
+    codec.compress_file(input_file, compressed_file)
 
 # Bzip2 Decompression function
 def decompress(compressed_file, output_file):
-    with open(compressed_file, 'rb') as fin:
-        compressed_data = fin.read()
-        decompressed_data = bz2.decompress(compressed_data)
+    codec.decompress_file(compressed_file, output_file)
+
+# Parallel Bzip2 compression: blocks are compressed on all cores and written as
+# concatenated streams, which bunzip2 still reads
+def compress_parallel(input_file, compressed_file):
+    parallel_codec.compress_file(input_file, compressed_file)
 
-    with open(output_file, 'wb') as fout:
-        fout.write(decompressed_data)
+# Parallel Bzip2 decompression: the streams are decoded on all cores
+def decompress_parallel(compressed_file, output_file):
+    parallel_codec.decompress_file(compressed_file, output_file)
 
 # Calculate file sizes and compression ratio
 def compression_ratio(input_file, compressed_file):
@@ -58,3 +64,24 @@ if __name__ == "__main__":
         print("Success: The decompressed file matches the original input file.")
     else:
         print("Error: The decompressed file does not match the original input file.")
+
+    # Parallel mode
+    compressed_file = 'compressed.parallel.bz2'
+
+    start_time = time.time()
+    compress_parallel(input_file, compressed_file)
+    compress_time = time.time() - start_time
+    print(f"Parallel compression time: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    decompress_parallel(compressed_file, output_file)
+    decompress_time = time.time() - start_time
+    print(f"Parallel decompression time: {decompress_time:.4f} seconds")
+
+    ratio = compression_ratio(input_file, compressed_file)
+    print(f"Parallel compression ratio: {ratio:.4f}")
+
+    if files_are_equal(input_file, output_file):
+        print("Success: The parallel-mode output matches the original input file.")
+    else:
+        print("Error: The parallel-mode output does not match the original input file.")
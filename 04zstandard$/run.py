@@ -1,36 +1,42 @@
 import time
 import os
-import zstandard as zstd
+import sys
+
+# Make the lossless package at the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lossless import get_codec
+from lossless.zstd_codec import train_dictionary, DictionaryCache
+
+# Compress with one worker thread per core
+codec = get_codec('zstd', threads=-1)
 
 
 # Zstandard Compression function
 def compress(input_file, compressed_file):
-    with open(input_file, 'rb') as fin:
-        data = fin.read()
+    codec.compress_file(input_file, compressed_file)
 
-        # Create a Zstandard compressor object
-        compressor = zstd.ZstdCompressor()
 
-        # Compress the data
-        compressed_data = compressor.compress(data)
+# Zstandard Decompression function
+def decompress(compressed_file, output_file):
+    codec.decompress_file(compressed_file, output_file)
 
-    with open(compressed_file, 'wb') as fout:
-        fout.write(compressed_data)
 
+# Split a file into small records (paragraphs)
+def read_records(input_file):
+    with open(input_file, 'rb') as fin:
+        return [record for record in fin.read().split(b'\n\n') if record]
 
-# Zstandard Decompression function
-def decompress(compressed_file, output_file):
-    with open(compressed_file, 'rb') as fin:
-        compressed_data = fin.read()
 
-        # Create a Zstandard decompressor object
-        decompressor = zstd.ZstdDecompressor()
+# Compress every record as its own frame with a codec, returning the frames
+def compress_records(codec, records):
+    return [codec.compress(record) for record in records]
 
-        # Decompress the data
-        decompressed_data = decompressor.decompress(compressed_data)
 
-    with open(output_file, 'wb') as fout:
-        fout.write(decompressed_data)
+# Decompress frames made with a trained dictionary, looking the dictionary up
+# in the cache by the ID recorded in the frames
+def decompress_records(frames, cache):
+    codec = get_codec('zstd', dictionary=cache.load_for_frame(frames[0]))
+    return [codec.decompress(frame) for frame in frames]
 
 
 # Calculate file sizes and compression ratio
@@ -73,3 +79,60 @@ if __name__ == "__main__":
         print("Success: The decompressed file matches the original input file.")
     else:
         print("Error: The decompressed file does not match the original input file.")
+
+    # Small records, without and with a trained dictionary
+    records = read_records(input_file)
+    raw_size = sum(map(len, records))
+    print(f"{len(records)} records, {raw_size / len(records):.0f} bytes on average")
+
+    start_time = time.time()
+    frames = compress_records(get_codec('zstd'), records)
+    compress_time = time.time() - start_time
+    print(f"Record compression time without dictionary: {compress_time:.4f} seconds, "
+          f"ratio {sum(map(len, frames)) / raw_size:.4f}")
+
+    # Train on every fourth record and store the dictionary in the cache
+    start_time = time.time()
+    cache = DictionaryCache()
+    dict_id = cache.save(train_dictionary(records[::4]))
+    train_time = time.time() - start_time
+    print(f"Dictionary training time: {train_time:.4f} seconds")
+
+    dict_codec = get_codec('zstd', dictionary=cache.load(dict_id))
+    start_time = time.time()
+    frames = compress_records(dict_codec, records)
+    compress_time = time.time() - start_time
+    print(f"Record compression time with dictionary: {compress_time:.4f} seconds, "
+          f"ratio {sum(map(len, frames)) / raw_size:.4f}")
+
+    start_time = time.time()
+    decompressed = decompress_records(frames, cache)
+    decompress_time = time.time() - start_time
+    print(f"Record decompression time with dictionary: {decompress_time:.4f} seconds")
+
+    if decompressed == records:
+        print("Success: The decompressed records match the original records.")
+    else:
+        print("Error: The decompressed records do not match the original records.")
+
+    # The same records through the batch API, which returns the frames and
+    # records without copying them into separate bytes objects
+    start_time = time.time()
+    frames = dict_codec.compress_batch(records)
+    compress_time = time.time() - start_time
+    print(f"Batch compression time with dictionary: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    decompressed = dict_codec.decompress_batch(frames)
+    decompress_time = time.time() - start_time
+    print(f"Batch decompression time with dictionary: {decompress_time:.4f} seconds")
+
+    # Frames stored contiguously, as in a record store, decode the same way
+    contiguous = dict_codec.decompress_batch(frames.tobytes(), frames.offsets)
+    dict_codec.close()
+
+    matches = [bytes(decompressed[i]) for i in range(len(decompressed))] == records
+    if matches and contiguous.tobytes() == b''.join(records):
+        print("Success: The batch output matches the original records.")
+    else:
+        print("Error: The batch output does not match the original records.")
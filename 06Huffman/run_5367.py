@@ -1,6 +1,8 @@
+import heapq
 import struct
 import time
 import os
+from collections import Counter
 
 # Define Huffman tree node class
 class HuffmanNode:
@@ -10,119 +12,233 @@ class HuffmanNode:
         self.left = None
         self.right = None
 
-# Function for node comparison to enable sorting
-def node_comparison(node1, node2):
-    return node1.freq < node2.freq
-
-# Build the Huffman tree
+# Build the Huffman tree with a priority queue. The insertion counter breaks
+# frequency ties so nodes themselves are never compared.
 def build_huffman_tree(frequency):
-    nodes = [HuffmanNode(char, freq) for char, freq in frequency.items()]
-
-    # Simulate a priority queue
-    while len(nodes) > 1:
-        # Sort nodes by frequency
-        nodes.sort(key=lambda x: x.freq)
+    heap = [(freq, i, HuffmanNode(char, freq)) for i, (char, freq) in enumerate(frequency.items())]
+    heapq.heapify(heap)
+    count = len(heap)
 
+    while len(heap) > 1:
         # Remove the two nodes with the lowest frequency and merge them
-        left = nodes.pop(0)
-        right = nodes.pop(0)
-        merged = HuffmanNode(freq=left.freq + right.freq)
+        left_freq, _, left = heapq.heappop(heap)
+        right_freq, _, right = heapq.heappop(heap)
+        merged = HuffmanNode(freq=left_freq + right_freq)
         merged.left = left
         merged.right = right
 
-        # Add the new merged node back to the list
-        nodes.append(merged)
+        # Add the new merged node back to the queue
+        heapq.heappush(heap, (merged.freq, count, merged))
+        count += 1
 
     # Return the root node of the Huffman tree
-    return nodes[0]
+    return heap[0][2]
+
+# Find the code length of every symbol from its depth in the tree. A lone
+# symbol still gets a 1-bit code.
+def code_lengths(tree):
+    lengths = {}
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.char is not None:
+            lengths[node.char] = max(depth, 1)
+        else:
+            stack.append((node.left, depth + 1))
+            stack.append((node.right, depth + 1))
+    return lengths
 
-# Generate the encoding table
-def generate_codes(node, prefix="", codebook={}):
-    if node is None:
-        return
+# Assign canonical codes: symbols sorted by (length, symbol) get consecutive
+# code values, so the code lengths alone are enough to rebuild the codes.
+# Returns {symbol: (code, length)}.
+def canonical_codes(lengths):
+    codes = {}
+    code = 0
+    prev_length = 0
+    for symbol, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+        code <<= length - prev_length
+        codes[symbol] = (code, length)
+        code += 1
+        prev_length = length
+    return codes
 
-    if node.char is not None:
-        codebook[node.char] = prefix
-    else:
-        generate_codes(node.left, prefix + "0", codebook)
-        generate_codes(node.right, prefix + "1", codebook)
-    return codebook
+# Encode data with canonical codes. Each code is shifted into an integer bit
+# accumulator, and whole 64-bit words are moved to the output buffer as soon as
+# they fill up. Returns the packed bytes and the number of padding bits.
+def huffman_encode(data, codes):
+    table = [codes.get(symbol, (0, 0)) for symbol in range(256)]
+    encoded = bytearray()
+    acc = 0
+    nbits = 0
+    for symbol in data:
+        code, length = table[symbol]
+        acc = (acc << length) | code
+        nbits += length
+        if nbits >= 64:
+            nbits -= 64
+            encoded += (acc >> nbits).to_bytes(8, 'big')
+            acc &= (1 << nbits) - 1
+
+    # Flush the remaining bits, padded with zeros to a whole byte
+    padding_length = -nbits % 8
+    encoded += (acc << padding_length).to_bytes((nbits + padding_length) // 8, 'big')
+    return encoded, padding_length
+
+# Number of bits the primary decoding table is indexed by
+DECODE_BITS = 12
+
+# Build the decoding tables for a set of canonical codes:
+#   single[p]      (symbol, length) of the code that starts the K-bit pattern p,
+#                  or None if p is the prefix of a code longer than K bits
+#   multi[p]       (decoded bytes, bits used) for all whole codes packed into p
+#   long_tables    for codes longer than K bits, see build_long_tables
+def build_decoding_tables(codes, bits=DECODE_BITS):
+    max_length = max(length for _, length in codes.values())
+    size = 1 << bits
+    single = [None] * size
+    long_codes = {}
+    for symbol, (code, length) in codes.items():
+        if length <= bits:
+            start = code << (bits - length)
+            single[start:start + (1 << (bits - length))] = [(symbol, length)] * (1 << (bits - length))
+        else:
+            long_codes.setdefault(code >> (length - bits), []).append((symbol, code, length))
+    long_tables = build_long_tables(long_codes, bits)
+
+    multi = []
+    for pattern in range(size):
+        decoded = bytearray()
+        used = 0
+        while True:
+            entry = single[(pattern << used) & (size - 1)]
+            if entry is None or used + entry[1] > bits:
+                break
+            decoded.append(entry[0])
+            used += entry[1]
+        multi.append((bytes(decoded), used))
+    return single, multi, long_tables, max_length
+
+# Build the secondary tables for codes longer than K bits. long_codes groups
+# (symbol, code, length) by the first K bits of the code. long_tables[(n, p)]
+# is (width, table) for the codes whose first n bits are p: table maps the next
+# width bits to (symbol, length), or to None when they are the prefix of a code
+# that is longer still, found in long_tables[(n + width, (p << width) | index)].
+# Each table is only as wide as the longest code under its own prefix, and at
+# most K bits, so even very deep codes need at most one table per long code.
+def build_long_tables(long_codes, bits):
+    long_tables = {}
+    pending = [(bits, prefix, group) for prefix, group in long_codes.items()]
+    while pending:
+        offset, prefix, group = pending.pop()
+        width = min(max(length for _, _, length in group) - offset, bits)
+        end = offset + width
+        table = [None] * (1 << width)
+        deeper = {}
+        for symbol, code, length in group:
+            if length <= end:
+                start = (code << (end - length)) & ((1 << width) - 1)
+                table[start:start + (1 << (end - length))] = [(symbol, length)] * (1 << (end - length))
+            else:
+                deeper.setdefault(code >> (length - end), []).append((symbol, code, length))
+        long_tables[(offset, prefix)] = (width, table)
+        pending.extend((end, next_prefix, next_group) for next_prefix, next_group in deeper.items())
+    return long_tables
+
+# Decode a payload of canonical Huffman codes. Bits are pulled from the payload
+# into an integer accumulator several bytes at a time; each step looks up the
+# next K bits and emits every whole code they contain. Near the end of the
+# stream, and for codes longer than K bits, symbols are decoded one at a time.
+def huffman_decode(payload, padding_length, codes, bits=DECODE_BITS):
+    if not codes:
+        return bytearray()
+    single, multi, long_tables, max_length = build_decoding_tables(codes, bits)
+    mask = (1 << bits) - 1
+    need = max(bits, max_length)
+    total = len(payload) * 8 - padding_length
+    data = bytes(payload) + bytes(need // 8 + 8)  # Zero bytes so peeks past the end are safe
+
+    decoded = bytearray()
+    acc = 0
+    nbits = 0
+    pos = 0
+    consumed = 0
+    while consumed < total:
+        while nbits < need:
+            acc = ((acc & ((1 << nbits) - 1)) << 48) | int.from_bytes(data[pos:pos + 6], 'big')
+            pos += 6
+            nbits += 48
+        peek = (acc >> (nbits - bits)) & mask
+
+        if total - consumed >= bits:
+            chunk, used = multi[peek]
+            if used:
+                decoded += chunk
+                nbits -= used
+                consumed += used
+                continue
+
+        entry = single[peek]
+        offset = bits
+        prefix = peek
+        while entry is None:
+            if (offset, prefix) not in long_tables:
+                raise ValueError(f"Invalid Huffman code at bit {consumed}")
+            width, table = long_tables[(offset, prefix)]
+            index = (acc >> (nbits - offset - width)) & ((1 << width) - 1)
+            entry = table[index]
+            offset += width
+            prefix = (prefix << width) | index
+        symbol, length = entry
+        if length > total - consumed:
+            raise ValueError("Truncated Huffman data")
+        decoded.append(symbol)
+        nbits -= length
+        consumed += length
+    return decoded
 
 # Compression function
 def huffman_compress(input_file, compressed_file):
-    with open(input_file, 'r') as fin:
+    with open(input_file, 'rb') as fin:
         data = fin.read()
 
     # Generate the frequency table
-    frequency = {}
-    for char in data:
-        if char in frequency:
-            frequency[char] += 1
-        else:
-            frequency[char] = 1
+    frequency = Counter(data)
 
-    # Build Huffman tree and codebook
-    huffman_tree = build_huffman_tree(frequency)
-    codebook = generate_codes(huffman_tree)
+    # Build Huffman tree and canonical codes
+    lengths = code_lengths(build_huffman_tree(frequency)) if frequency else {}
+    codes = canonical_codes(lengths)
 
     # Encode data
-    encoded_data = ''.join([codebook[char] for char in data])
+    encoded_data, padding_length = huffman_encode(data, codes)
 
-    # Write frequency table and encoded data
+    # Write the code length table and encoded data
     with open(compressed_file, 'wb') as fout:
-        fout.write(struct.pack('>I', len(frequency)))  # Write frequency table length
-        for char, freq in frequency.items():
-            fout.write(struct.pack('>cI', char.encode(), freq))  # Write character and frequency
-
-        # Write encoded data and add padding bits
-        padding_length = 8 - len(encoded_data) % 8
-        encoded_data += '0' * padding_length
-        fout.write(struct.pack('B', padding_length))  # Write padding length
-        for i in range(0, len(encoded_data), 8):
-            byte = encoded_data[i:i+8]
-            fout.write(struct.pack('B', int(byte, 2)))
+        header = bytearray(struct.pack('>H', len(codes)))  # Number of symbols
+        for symbol, (code, length) in codes.items():
+            header += struct.pack('>BB', symbol, length)  # Symbol and code length
+        header += struct.pack('B', padding_length)  # Padding length
+        fout.write(header)
+        fout.write(encoded_data)
 
 # Decompression function
 def huffman_decompress(compressed_file, output_file):
     with open(compressed_file, 'rb') as fin:
-        # Read the frequency table
-        frequency_length = struct.unpack('>I', fin.read(4))[0]
-        frequency = {}
-        for _ in range(frequency_length):
-            char = struct.unpack('>c', fin.read(1))[0].decode()
-            freq = struct.unpack('>I', fin.read(4))[0]
-            frequency[char] = freq
-
-        # Rebuild the Huffman tree
-        huffman_tree = build_huffman_tree(frequency)
+        # Read the code length table
+        symbol_count = struct.unpack('>H', fin.read(2))[0]
+        lengths = {}
+        for _ in range(symbol_count):
+            symbol, length = struct.unpack('>BB', fin.read(2))
+            lengths[symbol] = length
 
         # Read the padding length
         padding_length = struct.unpack('B', fin.read(1))[0]
 
-        # Read encoded data and convert it to a binary string
-        encoded_data = ''
-        while (byte := fin.read(1)):
-            encoded_data += f"{bin(byte[0])[2:]:>08}"
-
-        # Remove the padding bits
-        encoded_data = encoded_data[:-padding_length]
-
         # Decode data
-        decoded_data = []
-        current_node = huffman_tree
-        for bit in encoded_data:
-            if bit == '0':
-                current_node = current_node.left
-            else:
-                current_node = current_node.right
-
-            if current_node.char:
-                decoded_data.append(current_node.char)
-                current_node = huffman_tree
+        decoded_data = huffman_decode(fin.read(), padding_length, canonical_codes(lengths))
 
         # Write the decoded data to the output file
-        with open(output_file, 'w') as fout:
-            fout.write(''.join(decoded_data))
+        with open(output_file, 'wb') as fout:
+            fout.write(decoded_data)
 
 # Calculate file sizes and compression ratio
 def compression_ratio(input_file, compressed_file):
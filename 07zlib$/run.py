@@ -1,24 +1,20 @@
 import time
 import os
-import zlib
+import sys
+
+# Make the lossless package at the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lossless import get_codec
+
+codec = get_codec('zlib', level=9)  # level=9 for maximum compression
 
 # Zlib Compression function
 def compress(input_file, compressed_file):
-    with open(input_file, 'rb') as fin:
-        data = fin.read()
-        compressed_data = zlib.compress(data, level=9)  # level=9 for maximum compression
-
-    with open(compressed_file, 'wb') as fout:
-        fout.write(compressed_data)
+    codec.compress_file(input_file, compressed_file)
 
 # Zlib Decompression function
 def decompress(compressed_file, output_file):
-    with open(compressed_file, 'rb') as fin:
-        compressed_data = fin.read()
-        decompressed_data = zlib.decompress(compressed_data)
-
-    with open(output_file, 'wb') as fout:
-        fout.write(decompressed_data)
+    codec.decompress_file(compressed_file, output_file)
 
 # Calculate file sizes and compression ratio
 def compression_ratio(input_file, compressed_file):
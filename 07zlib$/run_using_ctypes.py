@@ -1,6 +1,7 @@
 import time
 import os
 import ctypes
+import zlib as zlib_module
 
 # Load the zlib shared library
 zlib = ctypes.CDLL("zlib1.dll" if os.name == 'nt' else "libz.so.1")
@@ -9,45 +10,174 @@ zlib = ctypes.CDLL("zlib1.dll" if os.name == 'nt' else "libz.so.1")
 Z_BEST_COMPRESSION = 9
 CHUNK_SIZE = 1024 * 1024  # 1 MB for chunk processing
 
-# Compression function using ctypes to call zlib
-def compress(input_file, compressed_file):
-    with open(input_file, 'rb') as fin:
-        data = fin.read()
-
-    # Allocate memory for the compressed data
-    data_size = len(data)
-    compressed_size = data_size + (data_size // 10) + 12  # Estimate for output size
-
-    compressed_data = ctypes.create_string_buffer(compressed_size)
+# Flush modes and return codes from zlib.h
+Z_NO_FLUSH = 0
+Z_FINISH = 4
+Z_OK = 0
+Z_STREAM_END = 1
+Z_NEED_DICT = 2
+Z_BUF_ERROR = -5
+
+# Compression method, window size and memory level defaults from zlib.h.
+# wbits is 9..15 for a zlib stream, -15..-9 for raw deflate and 25..31 for gzip;
+# for decompression 0 takes the window size from the zlib header and adding 32
+# detects zlib or gzip automatically.
+Z_DEFLATED = 8
+MAX_WBITS = 15
+DEF_MEM_LEVEL = 8
+
+# Compression strategies
+Z_DEFAULT_STRATEGY = 0
+Z_FILTERED = 1
+Z_HUFFMAN_ONLY = 2
+Z_RLE = 3
+Z_FIXED = 4
+
+
+# The z_stream structure that carries the buffers and state between calls
+class ZStream(ctypes.Structure):
+    _fields_ = [
+        ('next_in', ctypes.c_void_p),
+        ('avail_in', ctypes.c_uint),
+        ('total_in', ctypes.c_ulong),
+        ('next_out', ctypes.c_void_p),
+        ('avail_out', ctypes.c_uint),
+        ('total_out', ctypes.c_ulong),
+        ('msg', ctypes.c_char_p),
+        ('state', ctypes.c_void_p),
+        ('zalloc', ctypes.c_void_p),
+        ('zfree', ctypes.c_void_p),
+        ('opaque', ctypes.c_void_p),
+        ('data_type', ctypes.c_int),
+        ('adler', ctypes.c_ulong),
+        ('reserved', ctypes.c_ulong),
+    ]
+
+
+# Function signatures; deflateInit2 and inflateInit2 are macros around these
+zlib.zlibVersion.restype = ctypes.c_char_p
+zlib.deflateInit2_.argtypes = [ctypes.POINTER(ZStream), ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                               ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+zlib.inflateInit2_.argtypes = [ctypes.POINTER(ZStream), ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+for name in ('deflate', 'inflate'):
+    getattr(zlib, name).argtypes = [ctypes.POINTER(ZStream), ctypes.c_int]
+for name in ('deflateEnd', 'inflateEnd'):
+    getattr(zlib, name).argtypes = [ctypes.POINTER(ZStream)]
+
+ZLIB_VERSION = zlib.zlibVersion()
+
+
+# Raise an error for a zlib return code that is not one of the expected ones
+def check(ret, stream, expected=(Z_OK,)):
+    if ret not in expected:
+        message = stream.msg.decode() if stream.msg else f"return code {ret}"
+        if ret == Z_NEED_DICT:
+            message = "a preset dictionary is required"
+        raise ValueError(f"zlib error: {message}")
+    return ret
+
+
+# Address of a writable buffer (bytearray or memoryview) without copying it
+def buffer_address(buffer):
+    return ctypes.addressof(ctypes.c_char.from_buffer(buffer))
+
+
+# Compress a binary file object into another with deflate. in_buffer and
+# out_buffer are writable buffers (bytearray or memoryview) supplied by the
+# caller; zlib reads from and writes into them directly, and only the bytes
+# deflate actually produced are written out.
+def deflate_stream(fin, fout, in_buffer, out_buffer, level=Z_BEST_COMPRESSION, wbits=MAX_WBITS,
+                   mem_level=DEF_MEM_LEVEL, strategy=Z_DEFAULT_STRATEGY):
+    in_view = memoryview(in_buffer).cast('B')
+    out_view = memoryview(out_buffer).cast('B')
+    in_address = buffer_address(in_view)
+    out_address = buffer_address(out_view)
+
+    stream = ZStream()
+    check(zlib.deflateInit2_(ctypes.byref(stream), level, Z_DEFLATED, wbits, mem_level, strategy,
+                             ZLIB_VERSION, ctypes.sizeof(ZStream)), stream)
+    try:
+        flush = Z_NO_FLUSH
+        while flush != Z_FINISH:
+            n = fin.readinto(in_view)
+            flush = Z_FINISH if n == 0 else Z_NO_FLUSH
+            stream.next_in = in_address
+            stream.avail_in = n
+
+            # Run deflate until it stops filling the whole output buffer, i.e.
+            # until it has taken all the input (and, when finishing, ended the stream)
+            while True:
+                stream.next_out = out_address
+                stream.avail_out = len(out_view)
+                ret = check(zlib.deflate(ctypes.byref(stream), flush), stream, (Z_OK, Z_STREAM_END, Z_BUF_ERROR))
+                fout.write(out_view[:len(out_view) - stream.avail_out])
+                if stream.avail_out != 0 and (flush != Z_FINISH or ret == Z_STREAM_END):
+                    break
+        return stream.total_in, stream.total_out
+    finally:
+        zlib.deflateEnd(ctypes.byref(stream))
+
+
+# Decompress a deflate stream from a binary file object into another, with the
+# same caller-supplied buffers. Decoding stops at the end of the stream; input
+# that ends before it raises EOFError.
+def inflate_stream(fin, fout, in_buffer, out_buffer, wbits=MAX_WBITS):
+    in_view = memoryview(in_buffer).cast('B')
+    out_view = memoryview(out_buffer).cast('B')
+    in_address = buffer_address(in_view)
+    out_address = buffer_address(out_view)
+
+    stream = ZStream()
+    check(zlib.inflateInit2_(ctypes.byref(stream), wbits, ZLIB_VERSION, ctypes.sizeof(ZStream)), stream)
+    try:
+        ret = Z_OK
+        while ret != Z_STREAM_END:
+            n = fin.readinto(in_view)
+            if n == 0:
+                raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+            stream.next_in = in_address
+            stream.avail_in = n
+
+            # Inflate until the input is used up and the output buffer is not
+            # full any more, or until the stream ends
+            while True:
+                stream.next_out = out_address
+                stream.avail_out = len(out_view)
+                ret = check(zlib.inflate(ctypes.byref(stream), Z_NO_FLUSH), stream, (Z_OK, Z_STREAM_END, Z_BUF_ERROR))
+                fout.write(out_view[:len(out_view) - stream.avail_out])
+                if ret == Z_STREAM_END or (stream.avail_in == 0 and stream.avail_out != 0):
+                    break
+        return stream.total_in, stream.total_out
+    finally:
+        zlib.inflateEnd(ctypes.byref(stream))
 
-    # Compress the data
-    zlib.compress2(ctypes.byref(compressed_data),
-                   ctypes.c_ulong(compressed_size),
-                   data,
-                   len(data),
-                   Z_BEST_COMPRESSION)
 
-    with open(compressed_file, 'wb') as fout:
-        fout.write(compressed_data.raw)
+# Compression function using ctypes to call zlib
+def compress(input_file, compressed_file, level=Z_BEST_COMPRESSION, wbits=MAX_WBITS, strategy=Z_DEFAULT_STRATEGY):
+    with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout:
+        deflate_stream(fin, fout, bytearray(CHUNK_SIZE), bytearray(CHUNK_SIZE), level, wbits,
+                       strategy=strategy)
 
 # Decompression function using ctypes to call zlib
-def decompress(compressed_file, output_file):
-    with open(compressed_file, 'rb') as fin:
-        compressed_data = fin.read()
-
-    # Estimate the decompressed size (you may need a larger estimate)
-    decompressed_size = len(compressed_data) * 5  # Guessing max decompressed size
-
-    decompressed_data = ctypes.create_string_buffer(decompressed_size)
-
-    # Decompress the data
-    zlib.uncompress(ctypes.byref(decompressed_data),
-                    ctypes.c_ulong(decompressed_size),
-                    compressed_data,
-                    len(compressed_data))
-
-    with open(output_file, 'wb') as fout:
-        fout.write(decompressed_data.raw)
+def decompress(compressed_file, output_file, wbits=MAX_WBITS):
+    with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+        inflate_stream(fin, fout, bytearray(CHUNK_SIZE), bytearray(CHUNK_SIZE), wbits)
+
+# Same round trip through Python's zlib module, for comparison
+def compress_with_module(input_file, compressed_file, level=Z_BEST_COMPRESSION, wbits=MAX_WBITS,
+                         strategy=Z_DEFAULT_STRATEGY):
+    with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout:
+        compressor = zlib_module.compressobj(level, Z_DEFLATED, wbits, DEF_MEM_LEVEL, strategy)
+        while chunk := fin.read(CHUNK_SIZE):
+            fout.write(compressor.compress(chunk))
+        fout.write(compressor.flush())
+
+def decompress_with_module(compressed_file, output_file, wbits=MAX_WBITS):
+    with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+        decompressor = zlib_module.decompressobj(wbits)
+        while chunk := fin.read(CHUNK_SIZE):
+            fout.write(decompressor.decompress(chunk))
+        fout.write(decompressor.flush())
 
 # Calculate file sizes and compression ratio
 def compression_ratio(input_file, compressed_file):
@@ -87,3 +217,21 @@ if __name__ == "__main__":
         print("Success: The decompressed file matches the original input file.")
     else:
         print("Error: The decompressed file does not match the original input file.")
+
+    # The zlib module with the same settings, for comparison
+    module_file = 'compressed.module'
+
+    start_time = time.time()
+    compress_with_module(input_file, module_file)
+    compress_time = time.time() - start_time
+    print(f"zlib module compression time: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    decompress_with_module(module_file, output_file)
+    decompress_time = time.time() - start_time
+    print(f"zlib module decompression time: {decompress_time:.4f} seconds")
+
+    if files_are_equal(compressed_file, module_file):
+        print("Success: The ctypes output is identical to the zlib module output.")
+    else:
+        print("Note: The ctypes output differs from the zlib module output (different zlib builds).")
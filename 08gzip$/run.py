@@ -1,21 +1,20 @@
 import time
 import os
-import gzip
+import sys
+
+# Make the lossless package at the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lossless import get_codec
+
+codec = get_codec('gzip', level=9)
 
 # Gzip Compression function
 def compress(input_file, compressed_file):
-    with open(input_file, 'rb') as fin:
-        data = fin.read()
-        with gzip.open(compressed_file, 'wb', compresslevel=9) as fout:
-            fout.write(data)
+    codec.compress_file(input_file, compressed_file)
 
 # Gzip Decompression function
 def decompress(compressed_file, output_file):
-    with gzip.open(compressed_file, 'rb') as fin:
-        decompressed_data = fin.read()
-
-    with open(output_file, 'wb') as fout:
-        fout.write(decompressed_data)
+    codec.decompress_file(compressed_file, output_file)
 
 # Calculate file sizes and compression ratio
 def compression_ratio(input_file, compressed_file):
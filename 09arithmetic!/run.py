@@ -1,118 +1,499 @@
 import struct
 import time
 import os
-from decimal import Decimal, getcontext
+from bisect import bisect_right
+from itertools import accumulate
 
-# 设置浮点数精度
-getcontext().prec = 100
+# 区间编码器参数：low 为 32 位（进位时为 33 位），range 规范化后不小于 2^24
+RANGE_TOP = 1 << 24
+RANGE_MASK = 0xFFFFFFFF
+
+# 频率总和的上限，保证 range // total 至少有 8 位精度
+MAX_TOTAL = 1 << 16
+
+# 频率表中单个频率的上限（'>H' 能存储的最大值）
+MAX_FREQ = 0xFFFF
+
+# 编码器输出缓冲区大小，满了就写入文件
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# 区间编码器（带进位传播）。进位可能影响已经确定的字节，所以最高的一个
+# 字节和其后连续的 0xFF 字节先暂存在 cache / cache_size 中，确定没有进位后再输出。
+class RangeEncoder:
+    def __init__(self, fout):
+        self.fout = fout
+        self.low = 0
+        self.range = RANGE_MASK
+        self.cache = 0
+        self.cache_size = 1
+        self.out = bytearray()
+
+    # 编码累计频率区间 [start, start + size)，总频率为 total
+    def encode(self, start, size, total):
+        r = self.range // total
+        self.low += r * start
+        self.range = r * size
+        while self.range < RANGE_TOP:
+            self.range <<= 8
+            self.shift_low()
+
+    # 移出 low 的最高字节，并处理进位
+    def shift_low(self):
+        low = self.low
+        if low < 0xFF000000 or low > RANGE_MASK:
+            carry = low >> 32
+            out = self.out
+            out.append((self.cache + carry) & 0xFF)
+            if self.cache_size > 1:
+                out += bytes([(0xFF + carry) & 0xFF]) * (self.cache_size - 1)
+            self.cache_size = 0
+            self.cache = (low >> 24) & 0xFF
+            if len(out) >= OUTPUT_BUFFER_SIZE:
+                self.fout.write(out)
+                out.clear()
+        self.cache_size += 1
+        self.low = (low << 8) & RANGE_MASK
+
+    # 输出剩余的所有字节
+    def finish(self):
+        for _ in range(5):
+            self.shift_low()
+        self.fout.write(self.out)
+        self.out.clear()
+
+# 区间解码器，与 RangeEncoder 对应
+class RangeDecoder:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 5
+        self.range = RANGE_MASK
+        self.r = 0
+        self.code = int.from_bytes(bytes(data[:5]).ljust(5, b'\0'), 'big') & RANGE_MASK
+
+    # 返回当前编码值对应的累计频率（0 <= 结果 < total）
+    def get_freq(self, total):
+        self.r = self.range // total
+        return min(self.code // self.r, total - 1)
+
+    # 消去已解码符号的区间 [start, start + size)，必须紧跟在 get_freq 之后调用
+    def decode(self, start, size):
+        self.code -= start * self.r
+        self.range = self.r * size
+        while self.range < RANGE_TOP:
+            self.range <<= 8
+            byte = self.data[self.pos] if self.pos < len(self.data) else 0
+            self.pos += 1
+            self.code = ((self.code << 8) | byte) & RANGE_MASK
+
+# 把频率缩放到总和不超过 MAX_TOTAL，且每个出现过的符号频率至少为 1。
+# 频率表用 '>H' 存储，所以单个频率还必须不超过 MAX_FREQ（只有一种符号时总和可以等于 MAX_TOTAL）
+def scale_frequencies(frequency):
+    frequency = dict(frequency)
+    while sum(frequency.values()) > MAX_TOTAL or max(frequency.values(), default=0) > MAX_FREQ:
+        frequency = {symbol: max(freq >> 1, 1) for symbol, freq in frequency.items()}
+    return frequency
+
+# 计算整数累积频率数组：starts[s] 和 sizes[s] 是符号 s 的区间起点和宽度
+def cumulative_frequencies(frequency):
+    starts = [0] * 256
+    sizes = [0] * 256
+    low = 0
+    for symbol in sorted(frequency):
+        starts[symbol] = low
+        sizes[symbol] = frequency[symbol]
+        low += frequency[symbol]
+    return starts, sizes, low
+
+# 构造直接查找表：lookup[f] 是累积频率 f 所在区间的符号。总频率不超过
+# MAX_TOTAL，所以解码时用 get_freq 的结果直接索引，每个符号 O(1)。
+def build_lookup_table(sizes):
+    lookup = []
+    for symbol, size in enumerate(sizes):
+        lookup += [symbol] * size
+    return lookup
+
+# 树状数组（Fenwick 树），维护自适应模型的累积频率，更新和查询都是 O(log n)
+class FenwickTree:
+    def __init__(self, freq):
+        self.size = len(freq)
+        self.top = 1 << (self.size.bit_length() - 1)
+        self.rebuild(freq)
+
+    # 用新的频率数组重建整棵树，O(n)
+    def rebuild(self, freq):
+        self.freq = list(freq)
+        self.total = sum(self.freq)
+        tree = [0] + self.freq
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    # 符号 symbol 的频率加上 delta
+    def add(self, symbol, delta):
+        self.freq[symbol] += delta
+        self.total += delta
+        tree = self.tree
+        i = symbol + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    # 符号 symbol 之前所有符号的频率之和，即它的区间起点
+    def prefix(self, symbol):
+        tree = self.tree
+        total = 0
+        while symbol > 0:
+            total += tree[symbol]
+            symbol -= symbol & -symbol
+        return total
+
+    # 找到累积频率 target 所在区间的符号，返回 (符号, 区间起点)
+    def find(self, target):
+        tree = self.tree
+        pos = 0
+        start = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and start + tree[nxt] <= target:
+                pos = nxt
+                start += tree[nxt]
+            step >>= 1
+        return pos, start
+
+# 自适应 order-0 模型：所有符号初始频率为 1，每编码一个符号频率加 INCREMENT，
+# 总频率超过 MAX_TOTAL 时全部减半。编码器和解码器同步更新，不需要写频率表。
+class AdaptiveModel:
+    INCREMENT = 32
+
+    def __init__(self):
+        self.tree = FenwickTree([1] * 256)
+
+    def update(self, symbol):
+        tree = self.tree
+        tree.add(symbol, self.INCREMENT)
+        if tree.total > MAX_TOTAL:
+            tree.rebuild([(freq + 1) // 2 for freq in tree.freq])
+
+    def encode(self, encoder, symbol):
+        tree = self.tree
+        encoder.encode(tree.prefix(symbol), tree.freq[symbol], tree.total)
+        self.update(symbol)
+
+    def decode(self, decoder):
+        tree = self.tree
+        symbol, start = tree.find(decoder.get_freq(tree.total))
+        decoder.decode(start, tree.freq[symbol])
+        self.update(symbol)
+        return symbol
+
+# PPM 模型的上下文阶数和对应上下文表的大小（槽位数的二进制位数）。
+# order-1 和 order-2 的上下文可以直接作为下标；order-3 的上下文经过哈希映射到
+# 固定数量的槽位，发生冲突时覆盖旧的上下文，所以内存有上限。
+PPM_ORDERS = ((3, 18), (2, 16), (1, 8))
+
+# 一个上下文中频率总和超过这个值时全部减半
+PPM_RESCALE_LIMIT = 1 << 13
+
+# order-0 频率总和的上限
+ORDER0_RESCALE_LIMIT = 1 << 15
+
+# 哈希乘数（Knuth 乘法哈希）
+HASH_MULTIPLIER = 2654435761
+
+# 一个阶数的上下文表。每个槽位保存上下文本身（用于检查冲突）、出现过的符号
+# （bytearray）、对应的频率和频率总和，都放在按槽位下标访问的平铺列表中。
+class ContextTable:
+    def __init__(self, order, bits):
+        size = 1 << bits
+        self.direct = 8 * order <= bits
+        self.mask = size - 1
+        self.keys = [-1] * size
+        self.symbols = [None] * size
+        self.counts = [None] * size
+        self.totals = [0] * size
+
+    # 上下文对应的槽位下标
+    def index(self, ctx):
+        if self.direct:
+            return ctx
+        return ((ctx * HASH_MULTIPLIER) >> 16) & self.mask
+
+    # 在槽位 i 的上下文 ctx 中记录一次 symbol。新符号频率为 1，已有符号加 2
+    # （PPMD 的计数方式，转义频率等于不同符号的个数）。
+    def update(self, i, ctx, symbol):
+        if self.keys[i] != ctx:
+            self.keys[i] = ctx
+            self.symbols[i] = bytearray((symbol,))
+            self.counts[i] = [1]
+            self.totals[i] = 1
+            return
+        symbols = self.symbols[i]
+        counts = self.counts[i]
+        j = symbols.find(symbol)
+        if j < 0:
+            symbols.append(symbol)
+            counts.append(1)
+            self.totals[i] += 1
+        else:
+            counts[j] += 2
+            self.totals[i] += 2
+            if self.totals[i] > PPM_RESCALE_LIMIT:
+                counts[:] = [(count + 1) // 2 for count in counts]
+                self.totals[i] = sum(counts)
+
+# 自适应 PPM 模型（order-3/2/1/0，PPMD 转义估计，带排除和更新排除）。先在最高阶上下文中
+# 编码符号；如果该上下文没有见过这个符号，就编码一个转义，并把该上下文中出现
+# 过的符号从更低阶的统计中排除，再降到下一阶。order-0 包含全部 256 个符号，
+# 所以不会再转义。编码器和解码器同步更新，不需要写任何模型信息。
+class PPMModel:
+    def __init__(self):
+        self.tables = [ContextTable(order, bits) for order, bits in PPM_ORDERS]
+        self.masks = [(1 << (8 * order)) - 1 for order, _ in PPM_ORDERS]
+        self.order0 = [1] * 256
+        self.order0_total = 256
+        self.excluded = [0] * 256
+        self.stamp = 0
+        self.history = 0
+        self.set_contexts()
+
+    # 根据最近的字节计算各阶上下文及其槽位
+    def set_contexts(self):
+        self.contexts = [self.history & mask for mask in self.masks]
+        self.slots = [table.index(ctx) for table, ctx in zip(self.tables, self.contexts)]
+
+    # 开始一组新的排除：把 excluded 中等于新 stamp 的符号视为已排除
+    def new_exclusion(self):
+        self.stamp += 1
+        return self.stamp
+
+    def encode(self, encoder, symbol):
+        excluded = self.excluded
+        stamp = 0
+        for table, ctx, i in zip(self.tables, self.contexts, self.slots):
+            if table.keys[i] != ctx:
+                continue
+            symbols = table.symbols[i]
+            counts = table.counts[i]
+            if not stamp:
+                # 还没有排除任何符号，直接用保存的总和
+                total = table.totals[i]
+                distinct = len(symbols)
+                j = symbols.find(symbol)
+                if j >= 0:
+                    encoder.encode(sum(counts[:j]), counts[j], total + distinct)
+                    break
+            else:
+                start = -1
+                total = 0
+                distinct = 0
+                for sym, count in zip(symbols, counts):
+                    if excluded[sym] == stamp:
+                        continue
+                    if sym == symbol:
+                        start = total
+                        size = count
+                    total += count
+                    distinct += 1
+                if distinct == 0:
+                    continue
+                if start >= 0:
+                    encoder.encode(start, size, total + distinct)
+                    break
+
+            # 转义到更低阶
+            encoder.encode(total, distinct, total + distinct)
+            if not stamp:
+                stamp = self.new_exclusion()
+            for sym in symbols:
+                excluded[sym] = stamp
+        else:
+            counts = self.order0
+            if not stamp:
+                encoder.encode(sum(counts[:symbol]), counts[symbol], self.order0_total)
+            else:
+                start = 0
+                total = 0
+                for sym in range(256):
+                    if excluded[sym] == stamp:
+                        continue
+                    if sym == symbol:
+                        start = total
+                    total += counts[sym]
+                encoder.encode(start, counts[symbol], total)
+        self.update(symbol)
+
+    def decode(self, decoder):
+        excluded = self.excluded
+        stamp = 0
+        for table, ctx, i in zip(self.tables, self.contexts, self.slots):
+            if table.keys[i] != ctx:
+                continue
+            symbols = table.symbols[i]
+            counts = table.counts[i]
+            if not stamp:
+                total = table.totals[i]
+                distinct = len(symbols)
+                target = decoder.get_freq(total + distinct)
+                if target < total:
+                    ends = list(accumulate(counts))
+                    j = bisect_right(ends, target)
+                    decoder.decode(ends[j] - counts[j], counts[j])
+                    symbol = symbols[j]
+                    break
+            else:
+                candidates = [(sym, count) for sym, count in zip(symbols, counts) if excluded[sym] != stamp]
+                if not candidates:
+                    continue
+                total = sum(count for _, count in candidates)
+                distinct = len(candidates)
+                target = decoder.get_freq(total + distinct)
+                if target < total:
+                    start = 0
+                    for symbol, count in candidates:
+                        if target < start + count:
+                            break
+                        start += count
+                    decoder.decode(start, count)
+                    break
+
+            # 转义到更低阶
+            decoder.decode(total, distinct)
+            if not stamp:
+                stamp = self.new_exclusion()
+            for sym in symbols:
+                excluded[sym] = stamp
+        else:
+            counts = self.order0
+            if not stamp:
+                ends = list(accumulate(counts))
+                symbol = bisect_right(ends, decoder.get_freq(self.order0_total))
+                decoder.decode(ends[symbol] - counts[symbol], counts[symbol])
+            else:
+                candidates = [(sym, counts[sym]) for sym in range(256) if excluded[sym] != stamp]
+                target = decoder.get_freq(sum(count for _, count in candidates))
+                start = 0
+                for symbol, count in candidates:
+                    if target < start + count:
+                        break
+                    start += count
+                decoder.decode(start, count)
+        self.update(symbol)
+        return symbol
+
+    # 记录 symbol，然后移到下一个位置。采用更新排除：只更新从最高阶到实际编码
+    # 该符号的那一阶为止的上下文，更低阶的统计保持不变。
+    def update(self, symbol):
+        for table, ctx, i in zip(self.tables, self.contexts, self.slots):
+            found = table.keys[i] == ctx and table.symbols[i].find(symbol) >= 0
+            table.update(i, ctx, symbol)
+            if found:
+                break
+        else:
+            counts = self.order0
+            counts[symbol] += 2
+            self.order0_total += 2
+            if self.order0_total > ORDER0_RESCALE_LIMIT:
+                counts[:] = [(count + 1) // 2 for count in counts]
+                self.order0_total = sum(counts)
+        self.history = ((self.history << 8) | symbol) & 0xFFFFFF
+        self.set_contexts()
 
 # 压缩函数
 def arithmetic_compress(input_file, compressed_file):
-    with open(input_file, 'r') as fin:
+    with open(input_file, 'rb') as fin:
         data = fin.read()
 
-    # 生成频率表
+    # 生成频率表，并缩放到编码器的精度范围内
     frequency = {}
-    for char in data:
-        if char in frequency:
-            frequency[char] += 1
+    for symbol in data:
+        if symbol in frequency:
+            frequency[symbol] += 1
         else:
-            frequency[char] = 1
-
-    # 计算每个字符的概率
-    total_count = sum(frequency.values())
-    probabilities = {char: Decimal(frequency[char]) / Decimal(total_count) for char in frequency}
-
-    # 计算累积分布函数 (CDF)
-    cdf = {}
-    low = Decimal(0)
-    for char, prob in probabilities.items():
-        cdf[char] = (low, low + prob)
-        low += prob
-
-    # 算术编码
-    low, high = Decimal(0), Decimal(1)
-    for char in data:
-        char_low, char_high = cdf[char]
-        range_width = high - low
-        high = low + range_width * char_high
-        low = low + range_width * char_low
-
-        # 对区间进行缩放，以避免精度损失
-        while high < Decimal(0.5) or low > Decimal(0.5):
-            if high < Decimal(0.5):
-                low *= 2
-                high *= 2
-            elif low > Decimal(0.5):
-                low = (low - Decimal(0.5)) * 2
-                high = (high - Decimal(0.5)) * 2
-
-        # 检查区间宽度，并防止溢出
-        if (high - low) < Decimal('1e-50'):
-            break
-
-    # 将最终编码的值存储为字符串表示形式
-    code_value = (low + high) / 2
-    code_value_str = str(code_value)
-
-    # 写入频率表和编码值
+            frequency[symbol] = 1
+    frequency = scale_frequencies(frequency)
+    starts, sizes, total = cumulative_frequencies(frequency)
+
     with open(compressed_file, 'wb') as fout:
-        fout.write(struct.pack('>I', len(frequency)))  # 写入频率表长度
-        for char, freq in frequency.items():
-            fout.write(struct.pack('>cI', char.encode(), freq))  # 写入字符和频率
-        # 写入编码值
-        code_value_bytes = code_value_str.encode('utf-8')
-        fout.write(struct.pack('>I', len(code_value_bytes)))
-        fout.write(code_value_bytes)
+        # 写入数据长度和频率表
+        fout.write(struct.pack('>QH', len(data), len(frequency)))
+        for symbol in sorted(frequency):
+            fout.write(struct.pack('>BH', symbol, frequency[symbol]))
+
+        # 算术编码，编码结果边生成边写入
+        encoder = RangeEncoder(fout)
+        for symbol in data:
+            encoder.encode(starts[symbol], sizes[symbol], total)
+        encoder.finish()
 
 # 解压缩函数
 def arithmetic_decompress(compressed_file, output_file):
     with open(compressed_file, 'rb') as fin:
-        # 读取频率表
-        frequency_length = struct.unpack('>I', fin.read(4))[0]
+        # 读取数据长度和频率表
+        length, frequency_length = struct.unpack('>QH', fin.read(10))
         frequency = {}
         for _ in range(frequency_length):
-            char = struct.unpack('>c', fin.read(1))[0].decode()
-            freq = struct.unpack('>I', fin.read(4))[0]
-            frequency[char] = freq
-
-        # 计算每个字符的概率
-        total_count = sum(frequency.values())
-        probabilities = {char: Decimal(frequency[char]) / Decimal(total_count) for char in frequency}
-
-        # 计算累积分布函数 (CDF)
-        cdf = {}
-        low = Decimal(0)
-        for char, prob in probabilities.items():
-            cdf[char] = (low, low + prob)
-            low += prob
-
-        # 读取编码值
-        code_value_length = struct.unpack('>I', fin.read(4))[0]
-        code_value_str = fin.read(code_value_length).decode('utf-8')
-        code_value = Decimal(code_value_str)
-
-        # 解码
-        decoded_data = []
-
-        for _ in range(total_count):
-            for char, (char_low, char_high) in cdf.items():
-                if char_low <= code_value < char_high:
-                    decoded_data.append(char)
-                    range_width = char_high - char_low
-                    code_value = (code_value - char_low) / range_width
-
-                    # 对区间进行缩放，以避免精度损失
-                    while code_value < Decimal(0) or code_value >= Decimal(1):
-                        if code_value < Decimal(0.5):
-                            code_value *= 2
-                        elif code_value >= Decimal(0.5):
-                            code_value = (code_value - Decimal(0.5)) * 2
-                    break
+            symbol, freq = struct.unpack('>BH', fin.read(3))
+            frequency[symbol] = freq
+        starts, sizes, total = cumulative_frequencies(frequency)
+        data = fin.read()
+
+    # 解码：用查找表直接得到符号
+    lookup = build_lookup_table(sizes)
+    decoder = RangeDecoder(data)
+    decoded_data = bytearray()
+    for _ in range(length):
+        symbol = lookup[decoder.get_freq(total)]
+        decoder.decode(starts[symbol], sizes[symbol])
+        decoded_data.append(symbol)
+
+    # 写入解码后的数据
+    with open(output_file, 'wb') as fout:
+        fout.write(decoded_data)
+
+# 用自适应模型压缩：单遍编码，文件头只有数据长度
+def compress_with_model(input_file, compressed_file, model):
+    with open(input_file, 'rb') as fin:
+        data = fin.read()
+
+    with open(compressed_file, 'wb') as fout:
+        fout.write(struct.pack('>Q', len(data)))
+        encoder = RangeEncoder(fout)
+        for symbol in data:
+            model.encode(encoder, symbol)
+        encoder.finish()
+
+# 用自适应模型解压缩，模型必须和压缩时使用的相同
+def decompress_with_model(compressed_file, output_file, model):
+    with open(compressed_file, 'rb') as fin:
+        length = struct.unpack('>Q', fin.read(8))[0]
+        data = fin.read()
+
+    decoder = RangeDecoder(data)
+    decoded_data = bytearray()
+    for _ in range(length):
+        decoded_data.append(model.decode(decoder))
+
+    with open(output_file, 'wb') as fout:
+        fout.write(decoded_data)
 
-        # 写入解码后的数据
-        with open(output_file, 'w') as fout:
-            fout.write(''.join(decoded_data))
+# 自适应 order-0 压缩函数
+def arithmetic_compress_adaptive(input_file, compressed_file):
+    compress_with_model(input_file, compressed_file, AdaptiveModel())
+
+# 自适应 order-0 解压缩函数
+def arithmetic_decompress_adaptive(compressed_file, output_file):
+    decompress_with_model(compressed_file, output_file, AdaptiveModel())
+
+# PPM 压缩函数
+def arithmetic_compress_ppm(input_file, compressed_file):
+    compress_with_model(input_file, compressed_file, PPMModel())
+
+# PPM 解压缩函数
+def arithmetic_decompress_ppm(compressed_file, output_file):
+    decompress_with_model(compressed_file, output_file, PPMModel())
 
 # 计算文件大小和压缩比
 def compression_ratio(input_file, compressed_file):
@@ -133,11 +514,7 @@ if __name__ == "__main__":
 
     # 压缩
     start_time = time.time()
-    try:
-        arithmetic_compress(input_file, compressed_file)
-    except OverflowError:
-        print("Overflow occurred during compression. Adjusting precision or input size may help.")
-        exit(1)
+    arithmetic_compress(input_file, compressed_file)
     compress_time = time.time() - start_time
     print(f"Compression time: {compress_time:.4f} seconds")
 
@@ -156,3 +533,45 @@ if __name__ == "__main__":
         print("Success: The decompressed file matches the original input file.")
     else:
         print("Error: The decompressed file does not match the original input file.")
+
+    # 自适应模式
+    compressed_file = 'compressed.adaptive'
+
+    start_time = time.time()
+    arithmetic_compress_adaptive(input_file, compressed_file)
+    compress_time = time.time() - start_time
+    print(f"Adaptive compression time: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    arithmetic_decompress_adaptive(compressed_file, output_file)
+    decompress_time = time.time() - start_time
+    print(f"Adaptive decompression time: {decompress_time:.4f} seconds")
+
+    ratio = compression_ratio(input_file, compressed_file)
+    print(f"Adaptive compression ratio: {ratio:.4f}")
+
+    if files_are_equal(input_file, output_file):
+        print("Success: The adaptive output matches the original input file.")
+    else:
+        print("Error: The adaptive output does not match the original input file.")
+
+    # PPM 模式
+    compressed_file = 'compressed.ppm'
+
+    start_time = time.time()
+    arithmetic_compress_ppm(input_file, compressed_file)
+    compress_time = time.time() - start_time
+    print(f"PPM compression time: {compress_time:.4f} seconds")
+
+    start_time = time.time()
+    arithmetic_decompress_ppm(compressed_file, output_file)
+    decompress_time = time.time() - start_time
+    print(f"PPM decompression time: {decompress_time:.4f} seconds")
+
+    ratio = compression_ratio(input_file, compressed_file)
+    print(f"PPM compression ratio: {ratio:.4f}")
+
+    if files_are_equal(input_file, output_file):
+        print("Success: The PPM output matches the original input file.")
+    else:
+        print("Error: The PPM output does not match the original input file.")
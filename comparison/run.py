@@ -1,9 +1,9 @@
-import gzip
-import bz2
-import lzma
-import zstandard as zstd
-import brotli
 import os
+import sys
+
+# Make the lossless package at the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lossless import get_codec
 
 # File paths
 source_file = "../test.txt"
@@ -16,30 +16,23 @@ compressed_files = {
 }
 decompressed_file = "output.txt"
 
+# Codec settings; backends are only imported when get_codec() first asks for them
+codec_options = {
+    'gzip': {'level': 9},
+    'bz2': {'level': 9},
+    'lzma': {},
+    'zstd': {'level': 22},  # Level 22 for maximum compression
+    'brotli': {'level': 11}  # Quality 11 for maximum compression
+}
+
 # Function to get file size
 def get_file_size(file_path):
     return os.path.getsize(file_path)
 
-# Compress using gzip
-with open(source_file, 'rb') as f_in, gzip.open(compressed_files['gzip'], 'wb') as f_out:
-    f_out.write(f_in.read())
-
-# Compress using bz2
-with open(source_file, 'rb') as f_in, bz2.open(compressed_files['bz2'], 'wb') as f_out:
-    f_out.write(f_in.read())
-
-# Compress using lzma
-with open(source_file, 'rb') as f_in, lzma.open(compressed_files['lzma'], 'wb') as f_out:
-    f_out.write(f_in.read())
-
-# Compress using Zstandard
-with open(source_file, 'rb') as f_in, open(compressed_files['zstd'], 'wb') as f_out:
-    compressor = zstd.ZstdCompressor(level=22)  # Level 22 for maximum compression
-    f_out.write(compressor.compress(f_in.read()))
-
-# Compress using Brotli
-with open(source_file, 'rb') as f_in, open(compressed_files['brotli'], 'wb') as f_out:
-    f_out.write(brotli.compress(f_in.read(), quality=11))  # Quality 11 for maximum compression
+# Compress with every codec
+codecs = {algo: get_codec(algo, **codec_options[algo]) for algo in compressed_files}
+for algo, codec in codecs.items():
+    codec.compress_file(source_file, compressed_files[algo])
 
 # Calculate and display compression rates
 original_size = get_file_size(source_file)
@@ -51,22 +44,7 @@ best_algo = min(compression_rates, key=compression_rates.get)
 print(f"Best compression algorithm: {best_algo}")
 
 # Decompress the best compressed file and compare with the original
-if best_algo == 'gzip':
-    with gzip.open(compressed_files['gzip'], 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
-        f_out.write(f_in.read())
-elif best_algo == 'bz2':
-    with bz2.open(compressed_files['bz2'], 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
-        f_out.write(f_in.read())
-elif best_algo == 'lzma':
-    with lzma.open(compressed_files['lzma'], 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
-        f_out.write(f_in.read())
-elif best_algo == 'zstd':
-    with open(compressed_files['zstd'], 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
-        decompressor = zstd.ZstdDecompressor()
-        f_out.write(decompressor.decompress(f_in.read()))
-elif best_algo == 'brotli':
-    with open(compressed_files['brotli'], 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
-        f_out.write(brotli.decompress(f_in.read()))
+codecs[best_algo].decompress_file(compressed_files[best_algo], decompressed_file)
 
 # Verify if decompressed file matches the original
 with open(source_file, 'rb') as f_original, open(decompressed_file, 'rb') as f_decompressed:
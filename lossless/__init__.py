@@ -0,0 +1,16 @@
+# Unified interface to the compression engines in this repository.
+#
+#     from lossless import get_codec
+#     codec = get_codec('zstd', level=19)
+#     blob = codec.compress(data)
+#
+# Backends are imported lazily by the registry, so importing this package does
+# not pull in zstandard, brotli or any other engine until it is asked for.
+
+from lossless.base import Codec, ConcatenatedDecompressor, CHUNK_SIZE, decompress_bounded
+from lossless.registry import register, get_codec, available_codecs
+
+__all__ = [
+    'Codec', 'ConcatenatedDecompressor', 'CHUNK_SIZE', 'decompress_bounded',
+    'register', 'get_codec', 'available_codecs',
+]
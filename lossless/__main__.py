@@ -0,0 +1,26 @@
+import argparse
+import sys
+
+from lossless import get_codec, available_codecs
+
+
+# Command line: python -m lossless {compress,decompress} CODEC INPUT OUTPUT
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m lossless')
+    parser.add_argument('action', choices=['compress', 'decompress'])
+    parser.add_argument('codec', choices=available_codecs())
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--level', type=int, help="codec-specific compression level")
+    args = parser.parse_args(argv)
+
+    options = {} if args.level is None else {'level': args.level}
+    codec = get_codec(args.codec, **options)
+    if args.action == 'compress':
+        codec.compress_file(args.input, args.output)
+    else:
+        codec.decompress_file(args.input, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import collections
+
+# Size of the chunks used when streaming files through a codec
+CHUNK_SIZE = 1 << 20
+
+
+# Base class for all codecs. A subclass implements compressobj() and
+# decompressobj(); one-shot compression and file streaming are built on top of
+# them, and subclasses override the one-shot methods where the backend has a
+# faster native call. All methods accept any bytes-like object.
+class Codec:
+    name = None
+    extension = ''
+
+    def __init__(self, level=None):
+        self.level = level
+
+    # Return a streaming compressor with compress(data) and flush() methods
+    def compressobj(self):
+        raise NotImplementedError
+
+    # Return a streaming decompressor with decompress(data) and flush() methods
+    def decompressobj(self):
+        raise NotImplementedError
+
+    # Compress a whole buffer in one call
+    def compress(self, data):
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    # Decompress a whole buffer in one call
+    def decompress(self, data):
+        decompressor = self.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+    # Stream a file through the compressor chunk by chunk. Input is read into
+    # one reused buffer, so memory use does not depend on the file size.
+    def compress_file(self, input_file, compressed_file, chunk_size=CHUNK_SIZE):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout:
+            compressor = self.compressobj()
+            while n := fin.readinto(buffer):
+                fout.write(compressor.compress(view[:n]))
+            fout.write(compressor.flush())
+
+    # Stream a file through the decompressor chunk by chunk
+    def decompress_file(self, compressed_file, output_file, chunk_size=CHUNK_SIZE):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+            decompressor = self.decompressobj()
+            while n := fin.readinto(buffer):
+                fout.write(decompressor.decompress(view[:n]))
+            fout.write(decompressor.flush())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(level={self.level!r})"
+
+
+# Decompressor for formats whose files may hold several concatenated streams
+# (gzip members, bz2 and xz streams, zstd frames). factory() creates a fresh
+# single-stream decompressor with eof and unused_data attributes; a new one is
+# started whenever the current stream ends and more input follows.
+class ConcatenatedDecompressor:
+    def __init__(self, factory):
+        self.factory = factory
+        self.decompressor = factory()
+
+    def decompress(self, data):
+        out = []
+        while data:
+            if self.decompressor.eof:
+                self.decompressor = self.factory()
+            out.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data if self.decompressor.eof else b''
+        return b''.join(out)
+
+    def flush(self):
+        if not self.decompressor.eof:
+            raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+        return b''
+
+
+# Decompress a file object into another holding at most chunk_size bytes of
+# input and output at a time, however much a chunk expands. factory() creates
+# a single-stream decompressor with the bz2/lzma interface: decompress(data,
+# max_length), needs_input, eof and unused_data. Concatenated streams are
+# decoded one after another.
+def decompress_bounded(fin, fout, factory, chunk_size=CHUNK_SIZE):
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    decompressor = None
+    while True:
+        if decompressor is None or decompressor.eof:
+            # Start the next stream on the input left over from the last one
+            data = decompressor.unused_data if decompressor is not None else b''
+            if not data:
+                n = fin.readinto(buffer)
+                if not n:
+                    break
+                data = view[:n]
+            decompressor = factory()
+        elif decompressor.needs_input:
+            n = fin.readinto(buffer)
+            if not n:
+                raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+            data = view[:n]
+        else:
+            # Drain output still buffered inside the decompressor
+            data = b''
+        fout.write(decompressor.decompress(data, chunk_size))
+
+
+# Read a file object in blocks of the given size
+def read_blocks(fin, size):
+    while block := fin.read(size):
+        yield block
+
+
+# Run func over items in an executor and yield the results in order, keeping
+# at most window tasks in flight so a long input is never read ahead in full
+def map_in_order(pool, func, items, window):
+    pending = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
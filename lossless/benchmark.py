@@ -0,0 +1,257 @@
+import argparse
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lossless.registry import get_codec, available_codecs
+
+# Repository root; the hand-written coders live in script directories there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Coders that are standalone scripts rather than package backends:
+# name -> (script path, compress function, decompress function)
+SCRIPT_CODECS = {
+    'phrase': ('01/run.py', 'compress', 'decompress'),
+    'lzw': ('02LZW/run.py', 'compress', 'decompress'),
+    'huffman': ('06Huffman/run_5367.py', 'huffman_compress', 'huffman_decompress'),
+    'arithmetic': ('09arithmetic!/run.py', 'arithmetic_compress', 'arithmetic_decompress'),
+    'ppm': ('09arithmetic!/run.py', 'arithmetic_compress_ppm', 'arithmetic_decompress_ppm'),
+}
+
+# Scripts that have already been loaded
+_scripts = {}
+
+
+# Names of every codec the benchmark can run
+def benchmark_codecs():
+    return list(SCRIPT_CODECS) + available_codecs()
+
+
+# Load a script by path without running its __main__ block
+def load_script(path):
+    module = _scripts.get(path)
+    if module is None:
+        name = 'bench_' + ''.join(ch if ch.isalnum() else '_' for ch in path)
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[path] = module
+    return module
+
+
+# Return the file-to-file (compress, decompress) functions of a codec
+def codec_functions(name):
+    if name in SCRIPT_CODECS:
+        path, compress_name, decompress_name = SCRIPT_CODECS[name]
+        module = load_script(path)
+        return getattr(module, compress_name), getattr(module, decompress_name)
+    codec = get_codec(name)
+    return codec.compress_file, codec.decompress_file
+
+
+# Time repeated calls of func(src, dst) in nanoseconds, after some untimed warm-ups
+def time_runs(func, src, dst, warmup, repeat):
+    for _ in range(warmup):
+        func(src, dst)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func(src, dst)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+# Nearest-rank percentile of a list of samples
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+# Summarize timing samples; throughput is always given in uncompressed MB/s
+def summarize(samples, raw_size):
+    median = statistics.median(samples)
+    return {
+        'median_ns': median,
+        'p95_ns': percentile(samples, 95),
+        'min_ns': min(samples),
+        'samples_ns': samples,
+        'mb_per_s': raw_size / 1e6 / (median / 1e9) if median else float('inf'),
+    }
+
+
+# Peak RSS of this process in kB, or None where the resource module is not
+# available (Windows). ru_maxrss is in kB on Linux but in bytes on macOS.
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+# Run one direction once in this (fresh) process and report its memory use:
+# the tracemalloc peak of Python allocations and, where it can be measured,
+# the growth of the peak RSS, which also covers memory allocated inside C
+# libraries
+def measure_memory(name, direction, src, dst):
+    func = codec_functions(name)[direction == 'decompress']
+    rss_before = peak_rss_kb()
+    tracemalloc.start()
+    func(src, dst)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    memory = {'tracemalloc_peak': peak}
+    if rss_before is not None:
+        memory['rss_growth_kb'] = peak_rss_kb() - rss_before
+    return memory
+
+
+# Measure memory in a separate spawned process so each run starts from a clean
+# RSS high-water mark
+def measure_memory_isolated(name, direction, src, dst):
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(measure_memory, (name, direction, src, dst))
+
+
+# Benchmark one codec on an input file
+def benchmark_codec(name, input_file, workdir, warmup=1, repeat=5, memory=True):
+    compress, decompress = codec_functions(name)
+    compressed_file = os.path.join(workdir, name + '.compressed')
+    output_file = os.path.join(workdir, name + '.out')
+    raw_size = os.path.getsize(input_file)
+
+    result = {}
+    result['compress'] = summarize(time_runs(compress, input_file, compressed_file, warmup, repeat), raw_size)
+    result['decompress'] = summarize(time_runs(decompress, compressed_file, output_file, warmup, repeat), raw_size)
+    if memory:
+        result['compress'].update(measure_memory_isolated(name, 'compress', input_file, compressed_file))
+        result['decompress'].update(measure_memory_isolated(name, 'decompress', compressed_file, output_file))
+
+    result['compressed_size'] = os.path.getsize(compressed_file)
+    result['ratio'] = result['compressed_size'] / raw_size if raw_size else 0.0
+    with open(input_file, 'rb') as f1, open(output_file, 'rb') as f2:
+        result['roundtrip'] = f1.read() == f2.read()
+    return result
+
+
+# Benchmark a list of codecs and collect the results with the run settings.
+# A codec that fails is recorded as {'error': ...} and the others still run.
+def run_benchmark(names, input_file, warmup=1, repeat=5, memory=True, progress=None):
+    report = {
+        'input': os.path.abspath(input_file),
+        'input_size': os.path.getsize(input_file),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'warmup': warmup,
+        'repeat': repeat,
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            if progress:
+                progress(name)
+            try:
+                report['results'][name] = benchmark_codec(name, input_file, workdir, warmup, repeat, memory)
+            except Exception as e:
+                report['results'][name] = {'error': repr(e)}
+    return report
+
+
+# Compare a report with a saved baseline. A direction regresses when its median
+# time grows by more than the tolerance; a codec regresses when its output gets
+# larger, stops round-tripping or fails where the baseline did not. Returns a
+# list of messages.
+def compare_to_baseline(report, baseline, tolerance=0.10):
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        if 'error' in result:
+            if 'error' not in base:
+                regressions.append(f"{name}: failed with {result['error']}")
+            continue
+        if 'error' in base:
+            continue
+        for direction in ('compress', 'decompress'):
+            old, new = base[direction]['median_ns'], result[direction]['median_ns']
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name} {direction}: median {new / 1e6:.1f} ms vs "
+                                   f"baseline {old / 1e6:.1f} ms (+{(new / old - 1) * 100:.0f}%)")
+        if result['compressed_size'] > base['compressed_size']:
+            regressions.append(f"{name}: compressed size {result['compressed_size']} vs "
+                               f"baseline {base['compressed_size']}")
+        if base['roundtrip'] and not result['roundtrip']:
+            regressions.append(f"{name}: output no longer matches the input")
+    return regressions
+
+
+# Print a report as a table
+def print_report(report):
+    print(f"Input: {report['input']} ({report['input_size']} bytes), "
+          f"{report['warmup']} warm-up + {report['repeat']} timed runs")
+    print(f"{'codec':<12}{'ratio':>8}{'comp MB/s':>11}{'p95 ms':>9}{'decomp MB/s':>13}{'p95 ms':>9}"
+          f"{'comp peak':>11}{'decomp peak':>13}  ok")
+    for name, result in report['results'].items():
+        if 'error' in result:
+            print(f"{name:<12}error: {result['error']}")
+            continue
+        comp, decomp = result['compress'], result['decompress']
+        peaks = [f"{d['tracemalloc_peak'] / 1e6:.1f} MB" if 'tracemalloc_peak' in d else '-' for d in (comp, decomp)]
+        print(f"{name:<12}{result['ratio']:>8.4f}{comp['mb_per_s']:>11.2f}{comp['p95_ns'] / 1e6:>9.1f}"
+              f"{decomp['mb_per_s']:>13.2f}{decomp['p95_ns'] / 1e6:>9.1f}{peaks[0]:>11}{peaks[1]:>13}"
+              f"  {'yes' if result['roundtrip'] else 'NO'}")
+
+
+# Command line: python -m lossless.benchmark [--codecs a,b] [--baseline FILE] ...
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m lossless.benchmark')
+    parser.add_argument('--input', default=os.path.join(ROOT, 'test.txt'))
+    parser.add_argument('--codecs', default=','.join(benchmark_codecs()),
+                        help="comma-separated codecs (default: all of %(default)s)")
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help="skip the memory measurement runs")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--baseline', help="fail if results regress against this JSON report")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed relative slowdown against the baseline (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.codecs.split(',') if name]
+    unknown = set(names) - set(benchmark_codecs())
+    if unknown:
+        parser.error(f"unknown codecs: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(names, args.input, args.warmup, args.repeat, not args.no_memory,
+                           progress=lambda name: print(f"Benchmarking {name}...", file=sys.stderr))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fout:
+            json.dump(report, fout, indent=2)
+
+    # A failed codec has no roundtrip entry, so it fails the run as well
+    status = 0
+    if not all(result.get('roundtrip') for result in report['results'].values()):
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as fin:
+            regressions = compare_to_baseline(report, json.load(fin), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION: {message}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
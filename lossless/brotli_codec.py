@@ -0,0 +1,50 @@
+import brotli
+
+from lossless.base import Codec
+
+
+# Adapts brotli.Compressor to the compress()/flush() protocol
+class BrotliCompressor:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+# Adapts brotli.Decompressor to the decompress()/flush() protocol
+class BrotliDecompressor:
+    def __init__(self):
+        self.decompressor = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self.decompressor.process(data)
+
+    def flush(self):
+        if not self.decompressor.is_finished():
+            raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+        return b''
+
+
+# Brotli; level is the brotli quality (0-11)
+class BrotliCodec(Codec):
+    name = 'brotli'
+    extension = '.br'
+
+    def __init__(self, level=11):
+        super().__init__(level)
+
+    def compressobj(self):
+        return BrotliCompressor(self.level)
+
+    def decompressobj(self):
+        return BrotliDecompressor()
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def decompress(self, data):
+        return brotli.decompress(data)
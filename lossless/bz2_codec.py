@@ -0,0 +1,146 @@
+import bz2
+import collections
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from lossless.base import Codec, ConcatenatedDecompressor, CHUNK_SIZE, decompress_bounded, map_in_order, read_blocks
+
+# Start of a bzip2 stream: the "BZh" signature and block size digit, followed
+# by the magic number of the first block
+STREAM_START = re.compile(rb'BZh[1-9]1AY&SY')
+
+
+# Compress one block into a complete bzip2 stream
+def compress_block(args):
+    data, level = args
+    return bz2.compress(data, level)
+
+
+# Largest segment, compressed or decompressed, handled as one parallel task.
+# Streams written by the parallel mode hold a single block of at most 900 kB.
+MAX_SEGMENT_SIZE = 1 << 22
+
+
+# Decompress a run of whole bzip2 streams. Returns None when the data does not
+# split cleanly into streams, when it would decompress to more than
+# MAX_SEGMENT_SIZE bytes, or when the segment was too large to send (None).
+def decompress_segment(data):
+    if data is None:
+        return None
+    out = []
+    size = 0
+    try:
+        while data:
+            decompressor = bz2.BZ2Decompressor()
+            piece = decompressor.decompress(data, MAX_SEGMENT_SIZE - size)
+            out.append(piece)
+            size += len(piece)
+            if not decompressor.eof:
+                return None
+            data = decompressor.unused_data
+    except (OSError, ValueError, EOFError):
+        return None
+    return b''.join(out)
+
+
+# Cut a bzip2 file into segments that start where a stream starts, yielding
+# (file offset, segment) pairs. Whole streams are never split, but the
+# signature can also turn up by chance inside compressed data, so a segment is
+# not guaranteed to hold complete streams. A segment that grows past
+# MAX_SEGMENT_SIZE, as a long stream from plain bzip2 does, is yielded as
+# (offset, None) and ends the split.
+def split_streams(fin, chunk_size=CHUNK_SIZE):
+    data = bytearray()
+    offset = 0
+    while chunk := fin.read(chunk_size):
+        # Search from just before the new data in case a signature straddles chunks
+        search_from = max(len(data) - 9, 1)
+        data += chunk
+        start = 0
+        for match in STREAM_START.finditer(data, search_from):
+            yield offset + start, bytes(data[start:match.start()])
+            start = match.start()
+        del data[:start]
+        offset += start
+        if len(data) > MAX_SEGMENT_SIZE:
+            yield offset, None
+            return
+    if data:
+        yield offset, bytes(data)
+
+
+# bzip2; files with several concatenated streams are supported. Files are
+# streamed in both directions with constant memory. With workers other than 1,
+# files are handled pbzip2-style: the input is cut into blocks of level * 100 kB
+# that are compressed as separate streams in a process pool, and the streams of
+# a file are decompressed in parallel. Output of the parallel mode is a plain
+# multi-stream bzip2 file that bunzip2 reads as usual. workers=None uses every
+# core.
+class Bz2Codec(Codec):
+    name = 'bz2'
+    extension = '.bz2'
+
+    def __init__(self, level=9, workers=1):
+        super().__init__(level)
+        self.workers = workers
+
+    def compressobj(self):
+        return bz2.BZ2Compressor(self.level)
+
+    def decompressobj(self):
+        return ConcatenatedDecompressor(bz2.BZ2Decompressor)
+
+    def compress(self, data):
+        return bz2.compress(data, self.level)
+
+    def decompress(self, data):
+        return bz2.decompress(data)
+
+    def compress_file(self, input_file, compressed_file, chunk_size=CHUNK_SIZE):
+        if self.workers == 1:
+            return super().compress_file(input_file, compressed_file, chunk_size)
+        workers = self.workers or os.cpu_count()
+        with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout, \
+                ProcessPoolExecutor(workers) as pool:
+            blocks = ((block, self.level) for block in read_blocks(fin, self.level * 100_000))
+            empty = True
+            for stream in map_in_order(pool, compress_block, blocks, 2 * workers):
+                fout.write(stream)
+                empty = False
+            # An empty input still becomes one (empty) stream, as with bzip2
+            if empty:
+                fout.write(bz2.compress(b'', self.level))
+
+    # Cap the output of every decompress call as well, since a single chunk of
+    # bzip2 data can expand to far more than the chunk size
+    def decompress_file(self, compressed_file, output_file, chunk_size=CHUNK_SIZE):
+        if self.workers == 1:
+            with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+                decompress_bounded(fin, fout, bz2.BZ2Decompressor, chunk_size)
+            return
+
+        # A segment that fails on its own (cut at a false signature, too large,
+        # or simply corrupt) and everything after it is decoded serially from
+        # where the segment starts, which keeps memory bounded either way
+        workers = self.workers or os.cpu_count()
+        submitted = collections.deque()
+
+        def record(segments):
+            for offset, segment in segments:
+                submitted.append(offset)
+                yield segment
+
+        with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+            serial_from = None
+            with ProcessPoolExecutor(workers) as pool:
+                segments = record(split_streams(fin, chunk_size))
+                for result in map_in_order(pool, decompress_segment, segments, 2 * workers):
+                    offset = submitted.popleft()
+                    if result is None:
+                        serial_from = offset
+                        break
+                    fout.write(result)
+            if serial_from is not None:
+                fin.seek(serial_from)
+                decompress_bounded(fin, fout, bz2.BZ2Decompressor, chunk_size)
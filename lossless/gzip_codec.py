@@ -0,0 +1,28 @@
+import gzip
+import zlib
+
+from lossless.base import Codec, ConcatenatedDecompressor
+
+# wbits value that makes zlib read and write the gzip container
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+# gzip (deflate with the gzip wrapper); multi-member files are supported
+class GzipCodec(Codec):
+    name = 'gzip'
+    extension = '.gz'
+
+    def __init__(self, level=9):
+        super().__init__(level)
+
+    def compressobj(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+
+    def decompressobj(self):
+        return ConcatenatedDecompressor(lambda: zlib.decompressobj(GZIP_WBITS))
+
+    def compress(self, data):
+        return gzip.compress(data, self.level)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
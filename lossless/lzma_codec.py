@@ -0,0 +1,383 @@
+import bisect
+import lzma
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from lossless.base import Codec, ConcatenatedDecompressor, CHUNK_SIZE, decompress_bounded, map_in_order, read_blocks
+
+# Default amount of input per block in the multi-block format
+BLOCK_SIZE = 1 << 22
+
+# Largest block, by its uncompressed size, decoded whole as one parallel task.
+# Files with a larger block, or with a single block, are decoded serially.
+MAX_PARALLEL_BLOCK_SIZE = 1 << 24
+
+# Amount of input sampled when tuning the filter chain, taken in this many
+# evenly spaced pieces
+SAMPLE_SIZE = 1 << 19
+SAMPLE_PIECES = 4
+
+# Once this many seconds have been spent timing candidates, tuning stops
+TUNE_TIME_BUDGET = 5.0
+
+# Dictionary sizes tried by tuning lie between these bounds; the encoder needs
+# roughly ENCODER_MEMORY_FACTOR times the dictionary size in memory
+MIN_DICT_SIZE = 1 << 20
+MAX_DICT_SIZE = 1 << 26
+ENCODER_MEMORY_FACTOR = 12
+
+# xz container framing: the stream header and footer are 12 bytes each and
+# open and close with these magic bytes
+STREAM_MAGIC = b'\xfd7zXZ\x00'
+FOOTER_MAGIC = b'YZ'
+STREAM_HEADER_SIZE = 12
+
+
+# Encode an integer as an xz variable-length integer
+def encode_varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+# Decode an xz variable-length integer at pos; returns (value, next position)
+def decode_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise lzma.LZMAError("Corrupt xz index")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+# Round a size up to the 4-byte alignment of xz blocks
+def padded(size):
+    return (size + 3) & ~3
+
+
+# Build an xz index from (unpadded size, uncompressed size) block records
+def build_index(records):
+    index = bytearray(b'\x00')
+    index += encode_varint(len(records))
+    for unpadded_size, uncompressed_size in records:
+        index += encode_varint(unpadded_size)
+        index += encode_varint(uncompressed_size)
+    index += bytes(padded(len(index)) - len(index))
+    return bytes(index) + struct.pack('<I', zlib.crc32(index))
+
+
+# Build the stream footer for an index; flags are the two stream flag bytes
+def stream_footer(index, flags):
+    body = struct.pack('<I', len(index) // 4 - 1) + flags
+    return struct.pack('<I', zlib.crc32(body)) + body + FOOTER_MAGIC
+
+
+# Parse an index, returning its (unpadded size, uncompressed size) records
+def parse_index(index):
+    if index[0] != 0 or zlib.crc32(index[:-4]) != struct.unpack('<I', index[-4:])[0]:
+        raise lzma.LZMAError("Corrupt xz index")
+    count, pos = decode_varint(index, 1)
+    records = []
+    for _ in range(count):
+        unpadded_size, pos = decode_varint(index, pos)
+        uncompressed_size, pos = decode_varint(index, pos)
+        records.append((unpadded_size, uncompressed_size))
+    return records
+
+
+# Read the block index of an xz file. Streams are walked from the end of the
+# file, so files with several concatenated streams and stream padding work too.
+# Returns a list of (file offset, unpadded size, uncompressed offset,
+# uncompressed size, stream header) tuples, one per block.
+def read_xz_index(fin):
+    fin.seek(0, os.SEEK_END)
+    end = fin.tell()
+    streams = []
+    while end > 0:
+        # Skip stream padding (groups of four zero bytes)
+        if end < 2 * STREAM_HEADER_SIZE:
+            raise lzma.LZMAError("Not an xz file")
+        fin.seek(end - 4)
+        if fin.read(4) == bytes(4):
+            end -= 4
+            continue
+
+        fin.seek(end - STREAM_HEADER_SIZE)
+        footer = fin.read(STREAM_HEADER_SIZE)
+        if footer[-2:] != FOOTER_MAGIC or zlib.crc32(footer[4:10]) != struct.unpack('<I', footer[:4])[0]:
+            raise lzma.LZMAError("Corrupt xz stream footer")
+        index_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+        index_start = end - STREAM_HEADER_SIZE - index_size
+        if index_start < STREAM_HEADER_SIZE:
+            raise lzma.LZMAError("Corrupt xz stream footer")
+        fin.seek(index_start)
+        records = parse_index(fin.read(index_size))
+
+        start = index_start - sum(padded(unpadded_size) for unpadded_size, _ in records) - STREAM_HEADER_SIZE
+        if start < 0:
+            raise lzma.LZMAError("Corrupt xz index")
+        fin.seek(start)
+        header = fin.read(STREAM_HEADER_SIZE)
+        if header[:6] != STREAM_MAGIC or header[6:8] != footer[8:10]:
+            raise lzma.LZMAError("Corrupt xz stream header")
+        streams.append((start, header, records))
+        end = start
+
+    blocks = []
+    uncompressed_offset = 0
+    for start, header, records in reversed(streams):
+        offset = start + STREAM_HEADER_SIZE
+        for unpadded_size, uncompressed_size in records:
+            blocks.append((offset, unpadded_size, uncompressed_offset, uncompressed_size, header))
+            offset += padded(unpadded_size)
+            uncompressed_offset += uncompressed_size
+    return blocks
+
+
+# Positions and lengths of the pieces sampled from an input of total bytes:
+# the whole input when it fits in size, otherwise exactly pieces evenly spaced
+# slices that add up to size
+def sample_ranges(total, size=SAMPLE_SIZE, pieces=SAMPLE_PIECES):
+    if total <= size:
+        return [(0, total)]
+    return [(total * i // pieces, size // pieces) for i in range(pieces)]
+
+
+# Read up to size bytes of a file in evenly spaced pieces, so the sample
+# covers the whole file rather than only its beginning
+def read_sample(fin, size=SAMPLE_SIZE, pieces=SAMPLE_PIECES):
+    fin.seek(0, os.SEEK_END)
+    sample = []
+    for offset, length in sample_ranges(fin.tell(), size, pieces):
+        fin.seek(offset)
+        sample.append(fin.read(length))
+    fin.seek(0)
+    return b''.join(sample)
+
+
+# The same sample taken from a buffer in memory
+def buffer_sample(data, size=SAMPLE_SIZE, pieces=SAMPLE_PIECES):
+    view = memoryview(data).cast('B')
+    return b''.join(view[offset:offset + length] for offset, length in sample_ranges(len(view), size, pieces))
+
+
+# Dictionary size for an input of the given size: large enough to cover the
+# input, but not past the encoder memory limit (in bytes) when one is given.
+# A larger dictionary never hurts the ratio, so there is nothing to time here.
+def choose_dict_size(input_size, memory_limit=None):
+    dict_size = MIN_DICT_SIZE
+    while dict_size < min(input_size, MAX_DICT_SIZE):
+        dict_size <<= 1
+    if memory_limit is not None:
+        while dict_size > MIN_DICT_SIZE and dict_size * ENCODER_MEMORY_FACTOR > memory_limit:
+            dict_size >>= 1
+    return dict_size
+
+
+# Candidate filter chains, roughly from the fastest to the slowest: LZMA2
+# presets, LZMA2 with literal settings suited to text, and the delta and x86
+# BCJ filters in front of LZMA2 for binary data
+def candidate_chains(dict_size):
+    def lzma2(preset, **options):
+        return {'id': lzma.FILTER_LZMA2, 'preset': preset, 'dict_size': dict_size, **options}
+    chains = [[lzma2(1)], [lzma2(6)], [lzma2(6, lc=4, lp=0, pb=0)]]
+    chains += [[{'id': lzma.FILTER_DELTA, 'dist': dist}, lzma2(6)] for dist in (1, 2, 4)]
+    chains += [[{'id': lzma.FILTER_X86}, lzma2(6)]]
+    chains += [[lzma2(9 | lzma.PRESET_EXTREME)], [lzma2(9 | lzma.PRESET_EXTREME, lc=4, lp=0, pb=0)]]
+    return chains
+
+
+# Time the candidate chains on a sample and return the one with the best ratio
+# among those compressing at least min_speed MB/s (any speed when None). If
+# none is fast enough the fastest is returned. Candidates stop being tried once
+# time_budget seconds have passed. On the sample the dictionary is cut to the
+# sample size, so the timings are not dominated by setting up a large one.
+def tune_filters(sample, dict_size, min_speed=None, time_budget=TUNE_TIME_BUDGET):
+    sample_dict_size = max(min(dict_size, len(sample)), 1 << 12)
+    start = time.perf_counter()
+    results = []
+    for chain in candidate_chains(sample_dict_size):
+        if results and time.perf_counter() - start > time_budget:
+            break
+        chain_start = time.perf_counter()
+        size = len(lzma.compress(sample, format=lzma.FORMAT_XZ, filters=chain))
+        speed = len(sample) / 1e6 / max(time.perf_counter() - chain_start, 1e-9)
+        results.append((size, speed, chain))
+
+    fast_enough = [result for result in results if min_speed is None or result[1] >= min_speed]
+    if fast_enough:
+        chain = min(fast_enough, key=lambda result: result[0])[2]
+    else:
+        chain = max(results, key=lambda result: result[1])[2]
+    return [dict(spec, dict_size=dict_size) if spec['id'] == lzma.FILTER_LZMA2 else spec for spec in chain]
+
+
+# Compress one block of input. liblzma writes it as a complete single-block xz
+# stream; the block itself and its index record are cut out of that stream.
+# options are the preset or filters keyword for lzma.compress. Returns (block
+# bytes, unpadded size, uncompressed size).
+def compress_xz_block(args):
+    data, options = args
+    stream = lzma.compress(data, format=lzma.FORMAT_XZ, **options)
+    index_size = (struct.unpack('<I', stream[-8:-4])[0] + 1) * 4
+    index_start = len(stream) - STREAM_HEADER_SIZE - index_size
+    (unpadded_size, uncompressed_size), = parse_index(stream[index_start:index_start + index_size])
+    return stream[STREAM_HEADER_SIZE:index_start], unpadded_size, uncompressed_size
+
+
+# Decompress one block by wrapping it in a stream of its own; the stream's
+# index and the block's check validate the sizes and the content
+def decompress_xz_block(args):
+    header, block, unpadded_size, uncompressed_size = args
+    index = build_index([(unpadded_size, uncompressed_size)])
+    return lzma.decompress(header + block + index + stream_footer(index, header[6:8]), format=lzma.FORMAT_XZ)
+
+
+# Read the blocks listed in an xz index from a file
+def read_xz_blocks(fin, blocks):
+    for offset, unpadded_size, _, uncompressed_size, header in blocks:
+        fin.seek(offset)
+        yield header, fin.read(padded(unpadded_size)), unpadded_size, uncompressed_size
+
+
+# Random access to a multi-block xz file: read_at(offset, size) returns the
+# uncompressed bytes at offset and only decodes the blocks that cover them.
+# The last decoded block is kept for reads close to each other.
+class XzReader:
+    def __init__(self, path):
+        self.fin = open(path, 'rb')
+        self.blocks = read_xz_index(self.fin)
+        self.starts = [block[2] for block in self.blocks]
+        self.size = self.blocks[-1][2] + self.blocks[-1][3] if self.blocks else 0
+        self.cached = (None, b'')
+
+    # Decoded content of block i
+    def block_data(self, i):
+        if self.cached[0] != i:
+            self.cached = (i, decompress_xz_block(next(read_xz_blocks(self.fin, self.blocks[i:i + 1]))))
+        return self.cached[1]
+
+    def read_at(self, offset, size):
+        out = []
+        i = bisect.bisect_right(self.starts, offset) - 1
+        while size > 0 and 0 <= i < len(self.blocks) and offset < self.size:
+            data = self.block_data(i)
+            piece = data[offset - self.starts[i]:offset - self.starts[i] + size]
+            out.append(piece)
+            offset += len(piece)
+            size -= len(piece)
+            i += 1
+        return b''.join(out)
+
+    def close(self):
+        self.fin.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# xz container with LZMA2; level is the lzma preset. With workers other than 1
+# files are written as multi-block xz: the input is cut into blocks of
+# block_size bytes that are compressed independently in a process pool, and
+# the index at the end of the file records where every block starts. Such
+# files are plain xz that any xz tool reads; here their blocks are decoded in
+# parallel, and XzReader can read any range of them without decoding the rest.
+# workers=None uses every core.
+#
+# filters gives an explicit filter chain instead of the preset. With tune=True
+# the chain is picked per input instead: a sample is timed against a set of
+# candidate chains (see tune_filters) and the best one that reaches min_speed
+# MB/s is used, with a dictionary sized for the input within memory_limit
+# bytes. The chosen chain is kept in the filters attribute. xz block headers
+# record the filter chain, so decompression needs no settings either way.
+class LzmaCodec(Codec):
+    name = 'lzma'
+    extension = '.xz'
+
+    def __init__(self, level=lzma.PRESET_DEFAULT, workers=1, block_size=BLOCK_SIZE,
+                 filters=None, tune=False, min_speed=None, memory_limit=None):
+        super().__init__(level)
+        self.workers = workers
+        self.block_size = block_size
+        self.filters = filters
+        self.tune = tune
+        self.min_speed = min_speed
+        self.memory_limit = memory_limit
+
+    # Keyword arguments selecting the filter chain or preset for liblzma
+    def options(self):
+        if self.filters is not None:
+            return {'filters': self.filters}
+        return {'preset': self.level}
+
+    # Pick the filter chain for an input of input_size bytes from a sample
+    def tune_for(self, sample, input_size):
+        if sample:
+            dict_size = choose_dict_size(input_size, self.memory_limit)
+            self.filters = tune_filters(sample, dict_size, self.min_speed)
+
+    def compressobj(self):
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ, **self.options())
+
+    def decompressobj(self):
+        return ConcatenatedDecompressor(lzma.LZMADecompressor)
+
+    def compress(self, data):
+        if self.tune:
+            self.tune_for(buffer_sample(data), len(data))
+        return lzma.compress(data, format=lzma.FORMAT_XZ, **self.options())
+
+    def decompress(self, data):
+        return lzma.decompress(data)
+
+    def compress_file(self, input_file, compressed_file, chunk_size=CHUNK_SIZE):
+        if self.tune:
+            with open(input_file, 'rb') as fin:
+                sample = read_sample(fin)
+            input_size = os.path.getsize(input_file)
+            # Blocks are compressed independently, so no dictionary needs to outgrow one
+            self.tune_for(sample, input_size if self.workers == 1 else min(input_size, self.block_size))
+        if self.workers == 1:
+            return super().compress_file(input_file, compressed_file, chunk_size)
+        workers = self.workers or os.cpu_count()
+        header = lzma.compress(b'', format=lzma.FORMAT_XZ, **self.options())[:STREAM_HEADER_SIZE]
+        records = []
+        with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout, \
+                ProcessPoolExecutor(workers) as pool:
+            fout.write(header)
+            blocks = ((block, self.options()) for block in read_blocks(fin, self.block_size))
+            for block, unpadded_size, uncompressed_size in map_in_order(pool, compress_xz_block, blocks, 2 * workers):
+                fout.write(block)
+                records.append((unpadded_size, uncompressed_size))
+            index = build_index(records)
+            fout.write(index)
+            fout.write(stream_footer(index, header[6:8]))
+
+    # Cap the output of every decompress call, since a single chunk of xz data
+    # can expand to far more than the chunk size. Blocks are only decoded in
+    # parallel when there are several and each is small enough to hold whole.
+    def decompress_file(self, compressed_file, output_file, chunk_size=CHUNK_SIZE):
+        with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+            blocks = read_xz_index(fin) if self.workers != 1 else []
+            if len(blocks) < 2 or any(block[3] > MAX_PARALLEL_BLOCK_SIZE for block in blocks):
+                fin.seek(0)
+                decompress_bounded(fin, fout, lzma.LZMADecompressor, chunk_size)
+                return
+            workers = self.workers or os.cpu_count()
+            with ProcessPoolExecutor(workers) as pool:
+                for data in map_in_order(pool, decompress_xz_block, read_xz_blocks(fin, blocks), 2 * workers):
+                    fout.write(data)
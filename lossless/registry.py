@@ -0,0 +1,39 @@
+import importlib
+
+# Registered codecs: name -> (module, class name). The module is only imported
+# the first time the codec is requested.
+_registry = {
+    'zlib': ('lossless.zlib_codec', 'ZlibCodec'),
+    'gzip': ('lossless.gzip_codec', 'GzipCodec'),
+    'bz2': ('lossless.bz2_codec', 'Bz2Codec'),
+    'lzma': ('lossless.lzma_codec', 'LzmaCodec'),
+    'zstd': ('lossless.zstd_codec', 'ZstdCodec'),
+    'brotli': ('lossless.brotli_codec', 'BrotliCodec'),
+}
+
+# Codec classes that have already been imported
+_classes = {}
+
+
+# Register a codec class under a name, given as a module path and class name
+def register(name, module, class_name):
+    _registry[name] = (module, class_name)
+    _classes.pop(name, None)
+
+
+# Names of all registered codecs
+def available_codecs():
+    return sorted(_registry)
+
+
+# Create a codec by name, importing its backend on first use
+def get_codec(name, **options):
+    cls = _classes.get(name)
+    if cls is None:
+        try:
+            module, class_name = _registry[name]
+        except KeyError:
+            raise ValueError(f"Unknown codec {name!r}; available: {', '.join(available_codecs())}") from None
+        cls = getattr(importlib.import_module(module), class_name)
+        _classes[name] = cls
+    return cls(**options)
@@ -0,0 +1,21 @@
+import zlib
+
+from lossless.base import Codec, ConcatenatedDecompressor
+
+
+# zlib (deflate with the zlib wrapper)
+class ZlibCodec(Codec):
+    name = 'zlib'
+    extension = '.zlib'
+
+    def __init__(self, level=zlib.Z_DEFAULT_COMPRESSION):
+        super().__init__(level)
+
+    def compressobj(self):
+        return zlib.compressobj(self.level)
+
+    def decompressobj(self):
+        return ConcatenatedDecompressor(zlib.decompressobj)
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
@@ -0,0 +1,299 @@
+import array
+import itertools
+import os
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import zstandard as zstd
+
+from lossless.base import Codec, ConcatenatedDecompressor, CHUNK_SIZE
+
+# Window used for long-distance matching, as with "zstd --long"; decompressors
+# accept windows up to this size by default
+LONG_WINDOW_LOG = 27
+
+# Smallest slice of input fed to a decompressor at once when streaming files
+MIN_FEED_SIZE = 1 << 6
+
+# Default size of a trained dictionary
+DICT_SIZE = 1 << 16
+
+# Dictionary cache files: magic, cache format version and dictionary ID,
+# followed by the dictionary itself. Files written with another format
+# version are ignored.
+CACHE_MAGIC = b'LZDC'
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct('<4sHI')
+
+# Default location of the dictionary cache
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lossless', 'zstd')
+
+
+# Train a dictionary on a list of sample records. Small, similar records then
+# compress well on their own, because every frame starts from the dictionary
+# instead of from scratch.
+def train_dictionary(samples, dict_size=DICT_SIZE, level=3):
+    return zstd.train_dictionary(dict_size, samples, level=level, threads=-1)
+
+
+# On-disk store of trained dictionaries, one file per dictionary ID. The ID is
+# also recorded in every frame compressed with the dictionary, so the frames
+# alone are enough to find the dictionary they need.
+class DictionaryCache:
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def path(self, dict_id):
+        return os.path.join(self.directory, f'{dict_id:08x}.dict')
+
+    # Store a dictionary and return its ID. The file is written under a
+    # unique temporary name first, so readers never see a partial dictionary
+    # and concurrent writers do not clobber each other.
+    def save(self, dictionary):
+        dict_id = dictionary.dict_id()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                fout.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, dict_id))
+                fout.write(dictionary.as_bytes())
+            os.replace(temp_path, self.path(dict_id))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return dict_id
+
+    # Load a dictionary by ID, or return None when it is not cached or was
+    # written by another version of the cache format
+    def load(self, dict_id):
+        try:
+            with open(self.path(dict_id), 'rb') as fin:
+                header = fin.read(CACHE_HEADER.size)
+                content = fin.read()
+        except FileNotFoundError:
+            return None
+        if len(header) < CACHE_HEADER.size:
+            return None
+        magic, version, stored_id = CACHE_HEADER.unpack(header)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            return None
+        dictionary = zstd.ZstdCompressionDict(content)
+        if stored_id != dict_id or dictionary.dict_id() != dict_id:
+            raise ValueError(f"Dictionary cache file {self.path(dict_id)} is corrupt")
+        return dictionary
+
+    # Load the dictionary a compressed frame was made with; None if the frame
+    # does not use one
+    def load_for_frame(self, data):
+        dict_id = zstd.get_frame_parameters(data).dict_id
+        if not dict_id:
+            return None
+        dictionary = self.load(dict_id)
+        if dictionary is None:
+            raise ValueError(f"Dictionary {dict_id:08x} is not in the cache")
+        return dictionary
+
+
+# Zstandard. threads > 0 compresses with that many worker threads (-1: one per
+# core) and long=True enables long-distance matching over a 128 MiB window.
+# Files are streamed in large chunks, and the input size is written into the
+# frame header so a decompressor can allocate the output in one go.
+#
+# dictionary is a trained zstd.ZstdCompressionDict (see train_dictionary and
+# DictionaryCache). A copy of it is digested once when the codec is created, and the
+# compressor and decompressor are reused for every call, so a codec instance
+# should be kept around for a stream of small records.
+class ZstdCodec(Codec):
+    name = 'zstd'
+    extension = '.zst'
+
+    def __init__(self, level=3, threads=0, long=False, dictionary=None):
+        super().__init__(level)
+        self.threads = threads
+        self.long = long
+        options = {'threads': threads, 'write_content_size': True, 'write_dict_id': True}
+        if long:
+            options.update(enable_ldm=True, window_log=LONG_WINDOW_LOG)
+        self.params = zstd.ZstdCompressionParameters.from_level(level, **options)
+        # Digest a private copy: digesting a dictionary again replaces the
+        # digested form that other codecs built from it still point to
+        if dictionary is not None:
+            dictionary = zstd.ZstdCompressionDict(dictionary.as_bytes())
+            dictionary.precompute_compress(compression_params=self.params)
+        self.dictionary = dictionary
+        self.compressor = zstd.ZstdCompressor(dict_data=dictionary, compression_params=self.params)
+        self.decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+        # Thread pool of the batch calls and its threads' contexts, created
+        # once per thread and kept until close()
+        self.pool = None
+        self.local = threading.local()
+
+    def compressobj(self):
+        return self.compressor.compressobj()
+
+    def decompressobj(self):
+        return ConcatenatedDecompressor(self.decompressor.decompressobj)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    # The one-shot call needs a content size in the frame header and only reads
+    # a single frame; anything else goes through the streaming decompressor
+    def decompress(self, data):
+        if zstd.frame_content_size(data) < 0:
+            return super().decompress(data)
+        try:
+            return self.decompressor.decompress(data, allow_extra_data=False)
+        except zstd.ZstdError:
+            return super().decompress(data)
+
+    # Stream the file through a writer that knows the input size up front
+    def compress_file(self, input_file, compressed_file, chunk_size=CHUNK_SIZE):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(input_file, 'rb') as fin, open(compressed_file, 'wb') as fout:
+            size = os.fstat(fin.fileno()).st_size
+            with self.compressor.stream_writer(fout, size=size, write_size=chunk_size, closefd=False) as writer:
+                while n := fin.readinto(buffer):
+                    writer.write(view[:n])
+
+    # Stream the file through one decompressor per frame, so a frame that is
+    # cut off anywhere is caught by its decompressor not reaching eof. Input is
+    # fed in slices that double while the output of a call stays below
+    # chunk_size and halve when it grows past it, so a highly compressed run
+    # cannot expand into one huge piece of output.
+    def decompress_file(self, compressed_file, output_file, chunk_size=CHUNK_SIZE):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(compressed_file, 'rb') as fin, open(output_file, 'wb') as fout:
+            decompressor = None
+            feed_size = MIN_FEED_SIZE
+            while n := fin.readinto(buffer):
+                pos = 0
+                while pos < n:
+                    if decompressor is None or decompressor.eof:
+                        decompressor = self.decompressor.decompressobj()
+                    piece = view[pos:min(pos + feed_size, n)]
+                    out = decompressor.decompress(piece)
+                    fout.write(out)
+                    pos += len(piece) - len(decompressor.unused_data) if decompressor.eof else len(piece)
+                    if len(out) > chunk_size:
+                        feed_size = max(feed_size // 2, MIN_FEED_SIZE)
+                    elif len(out) < chunk_size // 2:
+                        feed_size = min(feed_size * 2, chunk_size)
+            if decompressor is not None and not decompressor.eof:
+                raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+
+    # Compress a list or iterable of buffers, each into its own frame, and
+    # return the frames as a Batch. threads=-1 uses every core.
+    def compress_batch(self, buffers, threads=-1):
+        buffers = list(buffers)
+        if not buffers:
+            return Batch([])
+        # zstandard's multi-threaded batch call crashes on empty buffers, so
+        # batches holding any go through the thread pool instead
+        if all(len(data) for data in buffers):
+            try:
+                return Batch(self.compressor.multi_compress_to_buffer(buffers, threads=threads))
+            except NotImplementedError:
+                pass
+        return Batch(self.map_batch(self.compress_slice, buffers, threads))
+
+    # Decompress a batch of frames: a Batch from compress_batch, or a
+    # contiguous buffer holding frame i at buffer[offsets[i]:offsets[i + 1]].
+    # Returns the records as a Batch.
+    def decompress_batch(self, frames, offsets=None, threads=-1):
+        if offsets is not None:
+            view = memoryview(frames)
+            source = [view[start:end] for start, end in zip(offsets, offsets[1:])]
+        else:
+            source = [frames[i] for i in range(len(frames))]
+        if not source:
+            return Batch([])
+        # The batch call needs every frame to record its decompressed size and,
+        # like the compressor, cannot handle empty frames
+        sizes = [zstd.frame_content_size(frame) for frame in source]
+        if min(sizes) > 0:
+            if offsets is not None:
+                segments = array.array('Q')
+                for start, end in zip(offsets, offsets[1:]):
+                    segments.extend((start, end - start))
+                native = zstd.BufferWithSegments(frames, segments.tobytes())
+            else:
+                native = frames.pieces
+            try:
+                return Batch(self.decompressor.multi_decompress_to_buffer(native, threads=threads))
+            except NotImplementedError:
+                pass
+        return Batch(self.map_batch(self.decompress_slice, source, threads))
+
+    # Split items into one slice per thread, run func on each slice in the
+    # codec's thread pool and return the results in order. The zstd calls
+    # release the GIL, so the slices are compressed in parallel. The pool is
+    # kept until close(), so each worker thread reuses its contexts across
+    # batches.
+    def map_batch(self, func, items, threads):
+        threads = min(os.cpu_count() if threads < 0 else max(threads, 1), len(items))
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(os.cpu_count())
+        step = -(-len(items) // threads)
+        slices = [items[i:i + step] for i in range(0, len(items), step)]
+        return [result for results in self.pool.map(func, slices) for result in results]
+
+    # Compress a slice of buffers with this thread's own compressor
+    def compress_slice(self, buffers):
+        compressor = getattr(self.local, 'compressor', None)
+        if compressor is None:
+            compressor = zstd.ZstdCompressor(dict_data=self.dictionary, compression_params=self.params)
+            self.local.compressor = compressor
+        return [compressor.compress(data) for data in buffers]
+
+    # Decompress a slice of frames with this thread's own decompressor
+    def decompress_slice(self, frames):
+        decompressor = getattr(self.local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = zstd.ZstdDecompressor(dict_data=self.dictionary)
+            self.local.decompressor = decompressor
+        # Frames without a recorded size need the streaming decompressor
+        return [decompressor.decompress(frame) if zstd.frame_content_size(frame) >= 0
+                else decompressor.decompressobj().decompress(frame) for frame in frames]
+
+    # Shut down the batch thread pool, releasing its threads and their contexts
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Output of a batch call: the frames (or records) in order, held without
+# copying. batch[i] is a buffer of piece i, and offsets gives the positions of
+# the pieces laid end to end, piece i at offsets[i]:offsets[i + 1] of
+# tobytes(). The native batch calls keep their output in one buffer per worker
+# thread, so a contiguous copy is only made when tobytes() is called.
+class Batch:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.offsets = array.array('Q', [0])
+        self.offsets.extend(itertools.accumulate(len(pieces[i]) for i in range(len(pieces))))
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def __getitem__(self, i):
+        return self.pieces[i]
+
+    # Total size of all pieces
+    def size(self):
+        return self.offsets[-1]
+
+    # All pieces joined into one contiguous buffer
+    def tobytes(self):
+        return b''.join(self.pieces[i] for i in range(len(self.pieces)))